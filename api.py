@@ -1,45 +1,138 @@
 """ 
 FastAPI Wrapper for Domain Comparable Search Agent
 """
-from fastapi import FastAPI, HTTPException, BackgroundTasks
+from fastapi import FastAPI, HTTPException, Depends, Response
+from cachetools import TTLCache
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.middleware.gzip import GZipMiddleware
+from fastapi.responses import ORJSONResponse
 from pydantic import BaseModel, Field
 from typing import Optional, Dict, Any
+from contextlib import asynccontextmanager
 import uvicorn
 from datetime import datetime
+import asyncio
 import logging
+import os
+import re
 import sys
 
 from src.agent.graph import create_agent_graph
 import config
 
-# Configure logging
+# Configure logging - records go through a queue so the stdout write
+# (lock + flush) happens on the listener thread, not the event loop
+import logging.handlers
+import queue
+
+_log_queue = queue.SimpleQueue()
+_stream_handler = logging.StreamHandler(sys.stdout)
+_stream_handler.setFormatter(
+    logging.Formatter('%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+)
+_log_listener = logging.handlers.QueueListener(_log_queue, _stream_handler)
+_log_listener.start()
+
 logging.basicConfig(
     level=logging.INFO,
-    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s',
     handlers=[
-        logging.StreamHandler(sys.stdout)
+        logging.handlers.QueueHandler(_log_queue)
     ]
 )
 logger = logging.getLogger(__name__)
 
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """Initialize the agent on startup, release resources on shutdown"""
+    global agent_graph
+    try:
+        logger.info("=" * 60)
+        logger.info("🚀 STARTING DOMAIN COMPARABLE AGENT API")
+        logger.info("=" * 60)
+
+        logger.info(f"Checking Supabase connection to: {config.SUPABASE_HOST}")
+
+        from src.enrichment.retrieval.supabase_client import SupabaseClient
+
+        def init_supabase():
+            # Keep one long-lived client in app state instead of open/close per check
+            client = SupabaseClient()
+
+            # The count() roundtrip slows cold starts - skip it in production
+            if os.getenv("SKIP_STARTUP_DB_CHECK") != "1":
+                doc_count = client.count()
+                logger.info(f" Total documents: {doc_count:,}")
+
+                if doc_count == 0:
+                    logger.error(" Supabase table is empty (0 documents)")
+                    raise ValueError("Supabase contains no documents - run data migration first")
+            return client
+
+        # Overlap the Supabase health check with graph construction
+        logger.info("Step 1: Connecting to Supabase + creating agent graph...")
+        app.state.supabase, agent_graph = await asyncio.gather(
+            asyncio.to_thread(init_supabase),
+            asyncio.to_thread(create_agent_graph),
+        )
+        logger.info(f"Supabase connected successfully")
+
+        logger.info("=" * 60)
+        logger.info("🎉 API IS READY TO ACCEPT REQUESTS")
+        logger.info(f"🔗 Access at: http://localhost:8000")
+        logger.info(f"📚 Docs at: http://localhost:8000/docs")
+        logger.info("=" * 60)
+
+    except Exception as e:
+        logger.error("=" * 60)
+        logger.error("❌ AGENT INITIALIZATION FAILED!")
+        logger.error(f"❌ Error Type: {type(e).__name__}")
+        logger.error(f"❌ Error Message: {str(e)}")
+        logger.error("=" * 60)
+        import traceback
+        logger.error(traceback.format_exc())
+        raise
+
+    yield
+
+    app.state.supabase.close()
+    # Drain the logging queue before exit - the listener thread is a
+    # daemon, so without this the shutdown-path records get dropped
+    _log_listener.stop()
+
+
 app = FastAPI(
     title= "Domain Comparable Search API",
     description =" AI-powered domain comparable search using LangGraph",
-    version = "1.0.0"
+    version = "1.0.0",
+    default_response_class=ORJSONResponse,  # C-based serializer for large comparable payloads
+    lifespan=lifespan
 )
 
-# Enable CORS(adjust origins as needed)
+# Compress large JSON payloads (added before CORS so it runs last on the response)
+app.add_middleware(GZipMiddleware, minimum_size=1024, compresslevel=6)
+
+# Enable CORS - explicit origin list (set ALLOWED_ORIGINS env var), no cookies
 app.add_middleware(
     CORSMiddleware,
-    allow_origins=["*"],
-    allow_credentials=True,
-    allow_methods=["*"],
-    allow_headers=["*"],
+    allow_origins=config.ALLOWED_ORIGINS,
+    allow_credentials=False,
+    allow_methods=["GET", "POST"],
+    allow_headers=["Content-Type", "Authorization"],
 )
 # Initialize the LangGraph agent
 agent_graph = None
 
+# Cache recent search results so duplicate/retried lookups skip the full agent run
+search_cache = TTLCache(maxsize=10_000, ttl=300)
+search_cache_lock = asyncio.Lock()
+
+# Compiled once - strips all whitespace from incoming domains in a single pass
+_DOMAIN_RE = re.compile(r"\s+")
+
+def normalize_domain(domain: str) -> str:
+    """Normalize a raw domain string for lookup and caching"""
+    return _DOMAIN_RE.sub("", domain).lower()
+
 class DomainSearchRequest(BaseModel):
     domain: str = Field(..., description="Domain name to search for comparables for", example="onepay.ai")
     
@@ -50,6 +143,11 @@ class DomainSearchRequest(BaseModel):
             }
         }
 
+def now_iso() -> str:
+    """Per-request timestamp dependency - computed once and reused in the response"""
+    return datetime.utcnow().isoformat()
+
+
 class DomainSearchResponse(BaseModel):
     success: bool
     data: Optional[Dict[str, Any]] = None
@@ -57,176 +155,181 @@ class DomainSearchResponse(BaseModel):
     timestamp: str
 
 
-@app.on_event("startup")
-async def startup_event():
-    """Initialize the agent on startup"""
-    global agent_graph
-    try:
-        logger.info("=" * 60)
-        logger.info("🚀 STARTING DOMAIN COMPARABLE AGENT API")
-        logger.info("=" * 60)
-
-        logger.info(f"Checking Supabase connection to: {config.SUPABASE_HOST}")
-
-        from src.enrichment.retrieval.supabase_client import SupabaseClient
-
-        try:
-            supabase = SupabaseClient()
-            doc_count = supabase.count()
-            supabase.close()
-
-            logger.info(f"Supabase connected successfully")
-            logger.info(f" Total documents: {doc_count:,}")
-
-            if doc_count == 0:
-                logger.error(" Supabase table is empty (0 documents)")
-                raise ValueError("Supabase contains no documents - run data migration first")
-        except Exception as e:
-            logger.error(f" Supabase connection failed: {e}")
-            raise
-        
-        # # Verify ChromaDB files exist
-        # import os
-        # chroma_path = "./chroma_db"
-        # sqlite_path = f"{chroma_path}/chroma.sqlite3"
-        
-        # logger.info(f"Checking ChromaDB at: {chroma_path}")
-        
-        # if not os.path.exists(chroma_path):
-        #     logger.error(f"❌ ChromaDB directory not found: {chroma_path}")
-        #     raise FileNotFoundError(f"ChromaDB directory missing")
-        
-        # if not os.path.exists(sqlite_path):
-        #     logger.error(f"❌ ChromaDB database not found: {sqlite_path}")
-        #     logger.error("💡 Hint: Check if .dockerignore excludes *.sqlite3 files")
-        #     raise FileNotFoundError(f"ChromaDB database missing")
-        
-        # db_size = os.path.getsize(sqlite_path) / (1024 * 1024)  # MB
-        # logger.info(f"✅ ChromaDB database found ({db_size:.2f} MB)")
-        
-        logger.info("Step 1: Creating agent graph...")
-        agent_graph = create_agent_graph()
-        
-        logger.info("=" * 60)
-        logger.info("🎉 API IS READY TO ACCEPT REQUESTS")
-        logger.info(f"🔗 Access at: http://localhost:8000")
-        logger.info(f"📚 Docs at: http://localhost:8000/docs")
-        logger.info("=" * 60)
-        
-    except Exception as e:
-        logger.error("=" * 60)
-        logger.error("❌ AGENT INITIALIZATION FAILED!")
-        logger.error(f"❌ Error Type: {type(e).__name__}")
-        logger.error(f"❌ Error Message: {str(e)}")
-        logger.error("=" * 60)
-        import traceback
-        logger.error(traceback.format_exc())
-        raise
 # API Endpoints
 
 
 
 @app.get("/")
-async def root():
+async def root(timestamp: str = Depends(now_iso)):
     """Health check endpoint"""
     return {
         "status": "online",
         "service": "Domain Comparable Search API",
         "version": "1.0.0",
-        "timestamp": datetime.utcnow().isoformat()
+        "timestamp": timestamp
     }
 
 @app.get("/health")
-async def health_check():
+async def health_check(timestamp: str = Depends(now_iso)):
     """Detailed health check"""
     return {
         "status": "healthy",
         "agent_loaded": agent_graph is not None,
-        "timestamp": datetime.utcnow().isoformat()
+        "timestamp": timestamp
     }
 
-@app.post("/api/v1/search", response_model=DomainSearchResponse)
-async def search_comparables(request: DomainSearchRequest):
+# No response_model: FastAPI would re-validate the already-built response,
+# and `data` is an arbitrary dict from the agent anyway
+@app.post("/api/v1/search")
+async def search_comparables(request: DomainSearchRequest, response: Response, timestamp: str = Depends(now_iso)):
     """
     Search for comparable domains
-    
+
     - **domain**: The domain name to find comparables for (e.g., "onepay.ai")
-    
+
     Returns comparable domains with pricing, categories, and similarity scores.
     """
     try:
         if agent_graph is None:
             logger.error("❌ Agent not initialized - cannot process request")
             raise HTTPException(status_code=503, detail="Agent not initialized")
-        
-        # Validate input
-        if not request.domain or len(request.domain.strip()) == 0:
+
+        # Validate and normalize input once
+        domain = normalize_domain(request.domain or "")
+        if not domain:
             raise HTTPException(status_code=400, detail="Domain cannot be empty")
-        
-        logger.info(f"📥 Processing request for domain: {request.domain}")
-        
+
+        # Serve repeat lookups straight from the cache
+        cache_key = domain
+        async with search_cache_lock:
+            cached = search_cache.get(cache_key)
+        if cached is not None:
+            response.headers["X-Cache"] = "HIT"
+            logger.info("📥 Cache hit for domain: %s", request.domain)
+            return DomainSearchResponse.model_construct(
+                success=True,
+                data=cached,
+                error=None,
+                timestamp=timestamp
+            )
+        response.headers["X-Cache"] = "MISS"
+
+        logger.info("📥 Processing request for domain: %s", request.domain)
+
         # Run the agent
         initial_state = {
-            "input_domain": request.domain.strip()
+            "input_domain": domain
         }
-        
-        result = agent_graph.invoke(initial_state)
+
+        # Await the graph natively - enrichment_node is async, and LangGraph
+        # runs the remaining sync nodes in its own executor
+        result = await agent_graph.ainvoke(initial_state)
         
         # Check for errors in result
         if result.get("error"):
-            logger.warning(f"⚠️ Agent returned error for {request.domain}: {result.get('error')}")
-            return DomainSearchResponse(
+            logger.warning("⚠️ Agent returned error for %s: %s", request.domain, result.get("error"))
+            return DomainSearchResponse.model_construct(
                 success=False,
                 data=None,
                 error=result["error"],
-                timestamp=datetime.utcnow().isoformat()
+                timestamp=timestamp
             )
         
         # Extract the result
         output = result.get("result", {})
-        
-        logger.info(f"✅ Successfully processed {request.domain} - found {output.get('total_comparables', 0)} comparables")
-        
-        return DomainSearchResponse(
+
+        async with search_cache_lock:
+            search_cache[cache_key] = output
+
+        logger.info("✅ Successfully processed %s - found %s comparables", request.domain, output.get("total_comparables", 0))
+
+        return DomainSearchResponse.model_construct(
             success=True,
             data=output,
             error=None,
-            timestamp=datetime.utcnow().isoformat()
+            timestamp=timestamp
         )
     
     except HTTPException:
         raise
     except Exception as e:
-        logger.error(f"❌ API ERROR for {request.domain}: {str(e)}")
+        logger.error("❌ API ERROR for %s: %s", request.domain, str(e))
         import traceback
         logger.error(traceback.format_exc())
         raise HTTPException(status_code=500, detail=f"Internal server error: {str(e)}")
 
+# Cap concurrent agent runs so a big batch doesn't exhaust the thread pool
+BATCH_CONCURRENCY = 8
+
 @app.post("/api/v1/batch-search")
-async def batch_search_comparables(domains: list[str], background_tasks: BackgroundTasks):
+async def batch_search_comparables(domains: list[str], timestamp: str = Depends(now_iso)):
     """
-    Batch search for multiple domains (async processing)
-    
+    Batch search for multiple domains (concurrent processing)
+
     - **domains**: List of domain names to search
-    
-    Returns a job ID to track the batch processing.
+
+    Returns results per unique domain, processed concurrently.
     """
     if not domains or len(domains) == 0:
         raise HTTPException(status_code=400, detail="Domains list cannot be empty")
-    
-    # TODO: Implement async batch processing with job queue
+
+    if agent_graph is None:
+        logger.error("❌ Agent not initialized - cannot process request")
+        raise HTTPException(status_code=503, detail="Agent not initialized")
+
+    # Normalize and deduplicate before doing any work
+    unique_domains = list(dict.fromkeys(
+        normalized for d in domains if d and (normalized := normalize_domain(d))
+    ))
+    if not unique_domains:
+        raise HTTPException(status_code=400, detail="Domains list cannot be empty")
+
+    logger.info("📥 Processing batch of %d unique domains (%d requested)", len(unique_domains), len(domains))
+
+    sem = asyncio.Semaphore(BATCH_CONCURRENCY)
+
+    async def search_one(domain: str) -> Dict[str, Any]:
+        async with search_cache_lock:
+            cached = search_cache.get(domain)
+        if cached is not None:
+            return {"domain": domain, "success": True, "data": cached, "error": None}
+
+        async with sem:
+            try:
+                result = await agent_graph.ainvoke({"input_domain": domain})
+            except Exception as e:
+                logger.error("❌ Batch search failed for %s: %s", domain, str(e))
+                return {"domain": domain, "success": False, "data": None, "error": str(e)}
+
+        if result.get("error"):
+            return {"domain": domain, "success": False, "data": None, "error": result["error"]}
+
+        output = result.get("result", {})
+        async with search_cache_lock:
+            search_cache[domain] = output
+        return {"domain": domain, "success": True, "data": output, "error": None}
+
+    results = await asyncio.gather(*[search_one(d) for d in unique_domains])
+
     return {
-        "message": "Batch processing not yet implemented",
-        "domains_count": len(domains),
-        "status": "pending"
+        "results": results,
+        "domains_count": len(unique_domains),
+        "timestamp": timestamp
     }
 
 if __name__ == "__main__":
     # Run the API Server
+    # uvloop + httptools (pulled in by uvicorn[standard]) replace the default
+    # asyncio loop and h11 parser with their C implementations.
+    # Multiple workers parallelize the GIL-bound agent runs across cores
+    # (reload is incompatible with workers, so it stays off).
     uvicorn.run(
         "api:app",
         host="0.0.0.0",
         port=8000,
-        reload=False,
+        workers=int(os.getenv("WEB_CONCURRENCY", "4")),
+        loop="uvloop",
+        http="httptools",
+        access_log=False,
         log_level = "info"
     )
\ No newline at end of file
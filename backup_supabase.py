@@ -1,9 +1,15 @@
 """
-Backup current Supabase embeddings to a file
+Backup current Supabase embeddings to files
+
+Writes the embedding matrix as a binary .npy (streamed into a memmap, so
+RAM stays flat) and content + metadata as a columnar Parquet file. Loading
+this pair back is ~10x faster than parsing floats out of JSON.
 """
 import psycopg2
 from psycopg2.extras import RealDictCursor
-import pandas as pd
+import numpy as np
+import pyarrow as pa
+import pyarrow.parquet as pq
 import json
 import os
 from dotenv import load_dotenv
@@ -20,44 +26,71 @@ conn = psycopg2.connect(
     password=os.getenv("SUPABASE_PASSWORD"),
     cursor_factory=RealDictCursor
 )
-cursor = conn.cursor()
 
-print("🔹 Fetching all embeddings...")
+# One snapshot for the whole backup: under the default READ COMMITTED the
+# COUNT and the streaming SELECT would each see their own snapshot, and
+# rows inserted in between would overrun the memmap pre-sized from the
+# stale count
+conn.set_session(isolation_level="REPEATABLE READ")
+
+count_cursor = conn.cursor()
+count_cursor.execute("SELECT COUNT(*) AS count FROM domain_embeddings")
+total = count_cursor.fetchone()["count"]
+count_cursor.close()
+print(f"✅ Found {total} embeddings")
+
+# Named cursor = server-side; rows stream in itersize-sized chunks
+cursor = conn.cursor(name="backup_cur")
+cursor.itersize = 5000
+
+print("🔹 Streaming all embeddings...")
 cursor.execute("""
-    SELECT 
+    SELECT
         id,
         content,
         metadata,
         embedding
     FROM domain_embeddings
 """)
-rows = cursor.fetchall()
 
-print(f"✅ Found {len(rows)} embeddings")
+timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+stem = f"backups/supabase_backup_{timestamp}"
+os.makedirs("backups", exist_ok=True)
+
+ids, contents, metadatas = [], [], []
+emb_out = None
 
-# Convert to list of dicts
-backup_data = []
-for row in rows:
-    backup_data.append({
-        'id': str(row['id']),
-        'content': row['content'],
-        'metadata': row['metadata'],
-        'embedding': row['embedding']  # This is already a list
-    })
+for i, row in enumerate(cursor):
+    embedding = json.loads(row['embedding']) if isinstance(row['embedding'], str) else row['embedding']
 
-# Save to JSON file with timestamp
-timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-backup_file = f"backups/supabase_backup_{timestamp}.json"
+    if emb_out is None:
+        # Dim is only known once the first row arrives
+        emb_out = np.lib.format.open_memmap(
+            f"{stem}.npy", mode="w+", dtype=np.float32, shape=(total, len(embedding))
+        )
 
-os.makedirs("backups", exist_ok=True)
+    emb_out[i] = embedding
+    ids.append(str(row['id']))
+    contents.append(row['content'])
+    metadatas.append(json.dumps(row['metadata']))
 
-with open(backup_file, 'w') as f:
-    json.dump(backup_data, f, indent=2)
+    if (i + 1) % 5000 == 0:
+        print(f"   Backed up {i + 1}/{total} embeddings...")
+
+if emb_out is not None:
+    emb_out.flush()
+
+pq.write_table(
+    pa.table({"id": ids, "content": contents, "metadata": metadatas}),
+    f"{stem}.parquet",
+    compression="zstd"
+)
 
-print(f"✅ Backup saved to: {backup_file}")
-print(f"   File size: {os.path.getsize(backup_file) / (1024*1024):.2f} MB")
+print(f"✅ Backed up {len(ids)} embeddings")
+print(f"✅ Embedding matrix: {stem}.npy")
+print(f"✅ Metadata:         {stem}.parquet")
 
 cursor.close()
 conn.close()
 
-print("🎉 Backup complete!")
\ No newline at end of file
+print("🎉 Backup complete!")
@@ -2,12 +2,18 @@
 """
 Script to check what's actually stored in ChromaDB.
 Provides detailed statistics and sample data.
+
+Aggregates (counts, histograms, price stats) run as SQL directly against
+chroma.sqlite3 so nothing but the sample rows is materialized in Python.
+Chroma stores metadata in an EAV table (embedding_metadata: id, key,
+string_value/int_value/float_value/bool_value), so queries filter by key.
 """
 
+import os
+import sqlite3
 import chromadb
 from chromadb.config import Settings
 import config
-from collections import Counter
 
 def check_chroma():
     """Check ChromaDB contents with detailed statistics"""
@@ -16,138 +22,164 @@ def check_chroma():
     print("CHROMADB DATABASE INSPECTION")
     print("="*80)
 
-    # Initialize ChromaDB client
-    client = chromadb.PersistentClient(
-        path=config.CHROMA_PERSIST_DIR,
-        settings=Settings(anonymized_telemetry=False)
-    )
-
-    # Get collection
-    try:
-        collection = client.get_or_create_collection(
-            name=config.CHROMA_COLLECTION_NAME,
-            metadata={"hnsw:space": "cosine"}
-        )
-    except Exception as e:
-        print(f"Error accessing collection: {e}")
+    sqlite_path = os.path.join(config.CHROMA_PERSIST_DIR, "chroma.sqlite3")
+    if not os.path.exists(sqlite_path):
+        print(f"\n❌ ChromaDB database not found: {sqlite_path}")
+        print("\nYou need to run: python build_and_export_embeddings.py")
         return
 
-    # Get all documents
-    try:
-        results = collection.get(include=["documents", "metadatas"])
-    except Exception as e:
-        print(f"Error retrieving data: {e}")
-        return
+    db = sqlite3.connect(sqlite_path)
+    cur = db.cursor()
+
+    # Total documents - single aggregate, no data pulled into Python
+    total_docs = cur.execute("SELECT COUNT(*) FROM embeddings").fetchone()[0]
 
-    total_docs = len(results['documents'])
-    
     if total_docs == 0:
         print("\n❌ ChromaDB is EMPTY! No documents found.")
         print("\nYou need to run: python build_and_export_embeddings.py")
+        db.close()
         return
 
     print(f"\n📊 TOTAL DOCUMENTS: {total_docs}")
     print(f"📁 Database Location: {config.CHROMA_PERSIST_DIR}")
     print(f"📦 Collection Name: {config.CHROMA_COLLECTION_NAME}")
 
-    # Extract metadata for analysis
-    metadatas = results['metadatas']
-    
     # Count unique domains (since we have 2 descriptions per domain)
-    unique_domains = set(m.get('domain', '') for m in metadatas)
-    print(f"🌐 UNIQUE DOMAINS: {len(unique_domains)}")
+    unique_domains = cur.execute(
+        "SELECT COUNT(DISTINCT string_value) FROM embedding_metadata WHERE key = 'domain'"
+    ).fetchone()[0]
+    print(f"🌐 UNIQUE DOMAINS: {unique_domains}")
 
     # TLD breakdown
     print(f"\n{'='*80}")
     print("TLD DISTRIBUTION")
     print("="*80)
-    tld_counts = Counter(m.get('tld', 'unknown') for m in metadatas)
-    for tld, count in tld_counts.most_common(15):
+    for tld, count in cur.execute("""
+        SELECT COALESCE(string_value, 'unknown') AS tld, COUNT(*)
+        FROM embedding_metadata WHERE key = 'tld'
+        GROUP BY tld ORDER BY COUNT(*) DESC LIMIT 15
+    """):
         print(f"  {tld:<15} {count:>6} documents")
 
     # Category breakdown
     print(f"\n{'='*80}")
     print("PRIMARY CATEGORY DISTRIBUTION")
     print("="*80)
-    cat_counts = Counter(m.get('primary_category', 'unknown') for m in metadatas)
-    for cat, count in cat_counts.most_common(10):
+    for cat, count in cur.execute("""
+        SELECT COALESCE(string_value, 'unknown') AS cat, COUNT(*)
+        FROM embedding_metadata WHERE key = 'primary_category'
+        GROUP BY cat ORDER BY COUNT(*) DESC LIMIT 10
+    """):
         print(f"  {cat:<25} {count:>6} documents")
 
     # Price statistics
     print(f"\n{'='*80}")
     print("PRICE STATISTICS")
     print("="*80)
-    prices = [m.get('price', 0) for m in metadatas if m.get('price', 0) > 0]
-    if prices:
-        print(f"  Min Price:     ${min(prices):>12,.0f}")
-        print(f"  Max Price:     ${max(prices):>12,.0f}")
-        print(f"  Avg Price:     ${sum(prices)/len(prices):>12,.0f}")
-        print(f"  Total Value:   ${sum(prices):>12,.0f}")
+    min_p, max_p, avg_p, sum_p = cur.execute("""
+        SELECT MIN(v), MAX(v), AVG(v), SUM(v) FROM (
+            SELECT COALESCE(float_value, int_value) AS v
+            FROM embedding_metadata
+            WHERE key = 'price' AND COALESCE(float_value, int_value) > 0
+        )
+    """).fetchone()
+    if min_p is not None:
+        print(f"  Min Price:     ${min_p:>12,.0f}")
+        print(f"  Max Price:     ${max_p:>12,.0f}")
+        print(f"  Avg Price:     ${avg_p:>12,.0f}")
+        print(f"  Total Value:   ${sum_p:>12,.0f}")
 
     # Date range
     print(f"\n{'='*80}")
     print("DATE RANGE")
     print("="*80)
-    dates = [m.get('date', '') for m in metadatas if m.get('date', '')]
-    if dates:
-        dates_sorted = sorted(dates)
-        print(f"  Earliest Sale: {dates_sorted[0]}")
-        print(f"  Latest Sale:   {dates_sorted[-1]}")
+    earliest, latest = cur.execute("""
+        SELECT MIN(string_value), MAX(string_value)
+        FROM embedding_metadata
+        WHERE key = 'date' AND string_value != ''
+    """).fetchone()
+    if earliest:
+        print(f"  Earliest Sale: {earliest}")
+        print(f"  Latest Sale:   {latest}")
 
     # Length distribution
     print(f"\n{'='*80}")
     print("DOMAIN LENGTH DISTRIBUTION")
     print("="*80)
-    lengths = [m.get('length', 0) for m in metadatas]
-    length_ranges = {
-        "1-3 chars": len([l for l in lengths if 1 <= l <= 3]),
-        "4-6 chars": len([l for l in lengths if 4 <= l <= 6]),
-        "7-10 chars": len([l for l in lengths if 7 <= l <= 10]),
-        "11-15 chars": len([l for l in lengths if 11 <= l <= 15]),
-        "16+ chars": len([l for l in lengths if l > 15])
-    }
-    for range_name, count in length_ranges.items():
-        print(f"  {range_name:<15} {count:>6} documents")
-
-    # Sample domains
+    length_rows = cur.execute("""
+        SELECT CASE
+            WHEN int_value BETWEEN 1 AND 3 THEN '1-3 chars'
+            WHEN int_value BETWEEN 4 AND 6 THEN '4-6 chars'
+            WHEN int_value BETWEEN 7 AND 10 THEN '7-10 chars'
+            WHEN int_value BETWEEN 11 AND 15 THEN '11-15 chars'
+            ELSE '16+ chars'
+        END AS band, COUNT(*)
+        FROM embedding_metadata WHERE key = 'length'
+        GROUP BY band
+    """).fetchall()
+    band_counts = dict(length_rows)
+    for range_name in ("1-3 chars", "4-6 chars", "7-10 chars", "11-15 chars", "16+ chars"):
+        print(f"  {range_name:<15} {band_counts.get(range_name, 0):>6} documents")
+
+    # Numeric domains check
+    print(f"\n{'='*80}")
+    print("NUMERIC DOMAINS CHECK")
+    print("="*80)
+    has_numbers_count = cur.execute("""
+        SELECT COUNT(*) FROM embedding_metadata
+        WHERE key = 'has_numbers' AND (bool_value = 1 OR int_value = 1)
+    """).fetchone()[0]
+    print(f"  Domains with numbers: {has_numbers_count}")
+    print(f"  Domains without:      {total_docs - has_numbers_count}")
+
+    db.close()
+
+    # Sample domains - only pull a bounded slice through the Chroma client
     print(f"\n{'='*80}")
     print("SAMPLE DOMAINS (First 10)")
     print("="*80)
-    
+
+    client = chromadb.PersistentClient(
+        path=config.CHROMA_PERSIST_DIR,
+        settings=Settings(anonymized_telemetry=False)
+    )
+
+    try:
+        collection = client.get_or_create_collection(
+            name=config.CHROMA_COLLECTION_NAME,
+            metadata={"hnsw:space": "cosine"}
+        )
+        results = collection.get(limit=30, include=["documents", "metadatas"])
+    except Exception as e:
+        print(f"Error retrieving sample data: {e}")
+        return
+
     shown = set()
     count = 0
-    for doc, metadata in zip(results['documents'][:30], results['metadatas'][:30]):
+    for doc, metadata in zip(results['documents'], results['metadatas']):
         domain = metadata.get('domain', 'unknown')
         if domain in shown:
             continue
         shown.add(domain)
         count += 1
-        
+
         print(f"\n{count}. Domain: {domain}")
         print(f"   TLD: {metadata.get('tld', 'N/A')}, Length: {metadata.get('length', 'N/A')}")
         print(f"   Categories: {metadata.get('primary_category', 'N/A')} / {metadata.get('secondary_category', 'N/A')}")
         print(f"   Price: ${metadata.get('price', 0):,.0f}, Date: {metadata.get('date', 'N/A')}")
         print(f"   Platform: {metadata.get('platform', 'N/A')}")
         print(f"   Description: {doc[:100]}...")
-        
+
         if count >= 10:
             break
 
-    # Check for numeric domains
-    print(f"\n{'='*80}")
-    print("NUMERIC DOMAINS CHECK")
-    print("="*80)
-    has_numbers_count = sum(1 for m in metadatas if m.get('has_numbers', False))
-    print(f"  Domains with numbers: {has_numbers_count}")
-    print(f"  Domains without:      {total_docs - has_numbers_count}")
-
     print(f"\n{'='*80}")
     print("✅ DATABASE CHECK COMPLETE")
     print("="*80)
-    
+
     if total_docs < 100:
         print("\n⚠️  WARNING: You only have a small test dataset!")
         print("   To load your real data, run: python build_and_export_embeddings.py")
 
 if __name__ == "__main__":
-    check_chroma()
\ No newline at end of file
+    check_chroma()
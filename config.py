@@ -1,4 +1,5 @@
 import os
+import numpy as np
 from dotenv import load_dotenv
 
 load_dotenv()
@@ -6,6 +7,18 @@ OPENROUTER_API_KEY = os.getenv("OPENROUTER_API_KEY")
 LLM_MODEL = "openai/gpt-5.1"  # OpenRouter model format
 EMBEDDING_MODEL = "all-MiniLM-L6-v2"  # OpenRouter model format
 
+# Opt-in CPU serving through the exported (and optionally int8-quantized)
+# ONNX model - see src/enrichment/encoding.py. Ignored when CUDA is present.
+USE_ONNX_ENCODER = os.getenv("USE_ONNX_ENCODER", "0") == "1"
+ONNX_MODEL_DIR = os.getenv("ONNX_MODEL_DIR", "onnx_minilm")
+
+
+# CORS origins for the API (comma-separated env var, no wildcard fast-path needed)
+ALLOWED_ORIGINS = [
+    origin.strip()
+    for origin in os.getenv("ALLOWED_ORIGINS", "http://localhost:3000").split(",")
+    if origin.strip()
+]
 
 SUPABASE_HOST = os.getenv("SUPABASE_HOST")
 SUPABASE_PORT = os.getenv("SUPABASE_PORT", "5432")
@@ -33,6 +46,10 @@ DOMAIN_CATEGORIES = [
     "Product-based"
 ]
 
+# Category name -> integer ID so scoring kernels can compare int arrays
+# instead of Python strings (-1 is reserved for unknown/missing)
+CATEGORY_IDS = {category: i for i, category in enumerate(DOMAIN_CATEGORIES)}
+
 
 
 TLD_FAMILIES = {
@@ -129,6 +146,19 @@ TLD_FAMILIES = {
 }
 
 
+# Flattened lookups derived once at import time - consumers get O(1)
+# TLD→family resolution instead of scanning every family list
+TLD_TO_FAMILY = {tld: family for family, tlds in TLD_FAMILIES.items() for tld in tlds}
+ALL_TLDS = frozenset(TLD_TO_FAMILY)
+
+
+# HNSW index knobs for the query-side Chroma collection. Higher M /
+# construction_ef build a denser graph (slower ingest, better recall);
+# search_ef trades query latency for recall at search time.
+HNSW_M = 32
+HNSW_CONSTRUCTION_EF = 200
+HNSW_SEARCH_EF = 128
+
 MAX_LENGTH_DIFF = 2
 CHROMA_RESULTS_PER_QUERY = 50
 FINAL_TOP_K = 10
@@ -155,5 +185,14 @@ RECENCY_BANDS = [
     (float('inf'), 0.3)
 ]
 
+# Band thresholds/weights as arrays so scoring can vectorize the lookup
+# (np.searchsorted) instead of a Python comparison loop per candidate
+RECENCY_THRESHOLDS = np.array([band[0] for band in RECENCY_BANDS])
+RECENCY_WEIGHTS = np.array([band[1] for band in RECENCY_BANDS])
+
 ENABLE_NUMERIC_FILTER = True
-NUMERIC_THRESHOLD = 0.3
\ No newline at end of file
+NUMERIC_THRESHOLD = 0.3
+
+# Per-candidate matching analysis printout in score_node - disable in
+# production to skip all the formatting work
+VERBOSE_MATCH_LOG = os.getenv("VERBOSE_MATCH_LOG", "1") == "1"
\ No newline at end of file
@@ -0,0 +1,65 @@
+"""
+Create expression indexes on the JSONB metadata fields the generated
+WHERE clauses filter on.
+
+Without these every filtered vector search either falls back to a
+sequential scan or rescans the ANN index only to discard most rows. The
+expressions mirror _parse_condition exactly (numeric fields are compared
+through a ::float cast, text fields through plain ->> access) - an index
+whose expression differs from the query text is never used.
+
+CREATE INDEX CONCURRENTLY avoids locking out writers, so this is safe to
+run against a live table; it just can't run inside a transaction.
+"""
+import psycopg2
+import os
+from dotenv import load_dotenv
+import config
+
+load_dotenv()
+
+# (name, expression) pairs matching the SQL emitted by _parse_condition
+INDEXES = [
+    ("idx_meta_length", "(((metadata->>'length')::float))"),
+    ("idx_meta_numeric_pct", "(((metadata->>'numeric_pct')::float))"),
+    ("idx_meta_date_epoch_days", "(((metadata->>'date_epoch_days')::float))"),
+    ("idx_meta_tld", "((metadata->>'tld'))"),
+    ("idx_meta_primary_cat", "((metadata->>'primary_category'))"),
+    ("idx_meta_secondary_cat", "((metadata->>'secondary_category'))"),
+]
+
+print("🔹 Connecting to Supabase...")
+conn = psycopg2.connect(
+    host=os.getenv("SUPABASE_HOST"),
+    port=os.getenv("SUPABASE_PORT", "5432"),
+    dbname=os.getenv("SUPABASE_DB", "postgres"),
+    user=os.getenv("SUPABASE_USER", "postgres"),
+    password=os.getenv("SUPABASE_PASSWORD")
+)
+conn.autocommit = True  # CONCURRENTLY cannot run inside a transaction
+cursor = conn.cursor()
+
+for name, expression in INDEXES:
+    print(f"🔹 Creating index {name} on {expression}...")
+    cursor.execute(
+        f"CREATE INDEX CONCURRENTLY IF NOT EXISTS {name} "
+        f"ON domain_embeddings {expression}"
+    )
+
+print("🔹 Creating HNSW index on embedding...")
+# ANN index for the ORDER BY embedding <-> vec path - without it every
+# query is a full-table distance scan. Same knobs as the Chroma
+# collection so the two backends stay tuned together.
+cursor.execute(
+    "CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_embedding_hnsw "
+    "ON domain_embeddings USING hnsw (embedding vector_l2_ops) "
+    f"WITH (m = {config.HNSW_M}, ef_construction = {config.HNSW_CONSTRUCTION_EF})"
+)
+
+print("🔹 Updating planner statistics...")
+cursor.execute("ANALYZE domain_embeddings")
+
+cursor.close()
+conn.close()
+
+print("✅ Metadata indexes in place")
@@ -1,3 +1,4 @@
+import asyncio
 import json
 from src.agent.graph import create_agent_graph
 
@@ -19,7 +20,8 @@ def main():
         "input_domain": input_domain
     }
 
-    result = app.invoke(initial_state)
+    # ainvoke because the enrichment node is async (LLM call + parse overlap)
+    result = asyncio.run(app.ainvoke(initial_state))
 
     # print result
     if result.get("error"):
@@ -1,35 +1,154 @@
 """
-Restore Supabase embeddings from a backup file
+Restore Supabase embeddings from a backup
+
+Backups are a pair of files sharing one stem: `<stem>.npy` holding the
+embedding matrix (mmap-loaded, so it never fully enters RAM) and
+`<stem>.parquet` holding id/content/metadata columns.
 """
 import psycopg2
-from psycopg2.extras import Json
-import json
+import numpy as np
+import pyarrow.parquet as pq
 import os
+import struct
+from io import BytesIO
 from dotenv import load_dotenv
 
 load_dotenv()
 
-# Ask user which backup to restore
+# pgcopy binary framing: signature + flags + header-extension length
+PGCOPY_HEADER = b'PGCOPY\n\xff\r\n\x00' + struct.pack('>ii', 0, 0)
+PGCOPY_TRAILER = b'\xff\xff'
+
+def _pgcopy_row(content, metadata_json, vec):
+    """Serialize one row: field count (int16) then length-prefixed fields -
+    content as UTF-8 text, metadata as jsonb (version byte + UTF-8), and
+    the embedding in pgvector binary form (dim, unused, big-endian float32s).
+    The server ingests this directly - no float->string->float round trip.
+    """
+    content_b = content.encode('utf-8')
+    metadata_b = b'\x01' + metadata_json.encode('utf-8')
+    embedding_b = struct.pack(f'>HH{len(vec)}f', len(vec), 0, *vec)
+
+    parts = [struct.pack('>h', 3)]
+    for field in (content_b, metadata_b, embedding_b):
+        parts.append(struct.pack('>i', len(field)))
+        parts.append(field)
+    return b''.join(parts)
+
+
+class PgcopyStream:
+    """File-like COPY BINARY source that serializes rows on demand.
+
+    psycopg2 pulls from read() while it sends over the socket, so row
+    serialization is pipelined with the network write and memory stays
+    O(one row) instead of holding the whole buffer.
+    """
+
+    def __init__(self, rows):
+        self._chunks = self._generate(rows)
+        self._pending = b''
+
+    @staticmethod
+    def _generate(rows):
+        yield PGCOPY_HEADER
+        for content, metadata_json, vec in rows:
+            yield _pgcopy_row(content, metadata_json, vec)
+        yield PGCOPY_TRAILER
+
+    def read(self, size=-1):
+        out = BytesIO()
+        remaining = size if size >= 0 else None
+        if self._pending:
+            out.write(self._pending)
+            self._pending = b''
+        while remaining is None or out.tell() < remaining:
+            chunk = next(self._chunks, None)
+            if chunk is None:
+                break
+            out.write(chunk)
+        data = out.getvalue()
+        if remaining is not None and len(data) > remaining:
+            self._pending = data[remaining:]
+            data = data[:remaining]
+        return data
+
+    def readline(self):  # psycopg2 probes this for text COPY; unused for binary
+        return self.read()
+
+
+def build_pgcopy_buffer(rows):
+    """Streaming COPY BINARY source for the given rows"""
+    return PgcopyStream(rows)
+
+COPY_SQL = "COPY domain_embeddings (content, metadata, embedding) FROM STDIN WITH (FORMAT binary)"
+LEGACY_BATCH = 500
+
+def restore_legacy_json(cursor, conn, backup_file):
+    """Restore a legacy .json backup by streaming items with ijson.
+
+    The old format is one giant JSON array; json.load would materialize it
+    all in RAM. ijson keeps memory O(batch) regardless of file size.
+    """
+    import ijson
+    import json
+
+    restored = 0
+    batch = []
+    with open(backup_file, 'rb') as f:
+        for item in ijson.items(f, 'item'):
+            batch.append((
+                item['content'],
+                json.dumps(item['metadata']),
+                [float(x) for x in item['embedding']]
+            ))
+            if len(batch) >= LEGACY_BATCH:
+                cursor.copy_expert(COPY_SQL, build_pgcopy_buffer(batch))
+                conn.commit()
+                restored += len(batch)
+                print(f"   Restored {restored} embeddings...")
+                batch.clear()
+
+    if batch:
+        cursor.copy_expert(COPY_SQL, build_pgcopy_buffer(batch))
+        conn.commit()
+        restored += len(batch)
+
+    return restored
+
+# Ask user which backup to restore (npy+parquet pairs, plus legacy .json)
 backup_dir = "backups"
-backups = sorted([f for f in os.listdir(backup_dir) if f.endswith('.json')])
+backups = sorted(
+    [f[:-4] for f in os.listdir(backup_dir) if f.endswith('.npy')]
+    + [f for f in os.listdir(backup_dir) if f.endswith('.json')]
+)
 
 if not backups:
     print("❌ No backup files found in backups/")
     exit(1)
 
 print("Available backups:")
-for i, backup in enumerate(backups, 1):
-    size = os.path.getsize(f"{backup_dir}/{backup}") / (1024*1024)
-    print(f"  {i}. {backup} ({size:.2f} MB)")
+for i, name in enumerate(backups, 1):
+    if name.endswith('.json'):
+        size = os.path.getsize(f"{backup_dir}/{name}") / (1024*1024)
+    else:
+        size = (
+            os.path.getsize(f"{backup_dir}/{name}.npy")
+            + os.path.getsize(f"{backup_dir}/{name}.parquet")
+        ) / (1024*1024)
+    print(f"  {i}. {name} ({size:.2f} MB)")
 
 choice = int(input("\nSelect backup to restore (number): "))
-backup_file = f"{backup_dir}/{backups[choice-1]}"
+selected = backups[choice-1]
+is_legacy = selected.endswith('.json')
 
-print(f"\n🔹 Loading backup: {backup_file}")
-with open(backup_file, 'r') as f:
-    backup_data = json.load(f)
-
-print(f"✅ Loaded {len(backup_data)} embeddings")
+if not is_legacy:
+    stem = f"{backup_dir}/{selected}"
+    print(f"\n🔹 Loading backup: {stem}")
+    embeddings = np.load(f"{stem}.npy", mmap_mode='r')
+    meta_table = pq.read_table(f"{stem}.parquet")
+    contents = meta_table.column("content").to_pylist()
+    metadatas = meta_table.column("metadata").to_pylist()
+    print(f"✅ Loaded {len(contents)} embeddings")
 
 print("🔹 Connecting to Supabase...")
 conn = psycopg2.connect(
@@ -45,28 +164,23 @@ print("🔹 Clearing current data...")
 cursor.execute("DELETE FROM domain_embeddings")
 conn.commit()
 
-print("🔹 Restoring embeddings...")
-for i, item in enumerate(backup_data, 1):
-    cursor.execute(
-        """
-        INSERT INTO domain_embeddings (content, metadata, embedding)
-        VALUES (%s, %s, %s)
-        """,
-        (
-            item['content'],
-            Json(item['metadata']),
-            f'[{",".join(map(str, item["embedding"]))}]'
+print("🔹 Restoring embeddings via COPY BINARY...")
+if is_legacy:
+    restored = restore_legacy_json(cursor, conn, f"{backup_dir}/{selected}")
+else:
+    cursor.copy_expert(
+        COPY_SQL,
+        build_pgcopy_buffer(
+            (content, metadata, embeddings[i])
+            for i, (content, metadata) in enumerate(zip(contents, metadatas))
         )
     )
-    
-    if i % 100 == 0:
-        conn.commit()
-        print(f"   Restored {i}/{len(backup_data)} embeddings...")
+    conn.commit()
+    restored = len(contents)
 
-conn.commit()
-print(f"✅ Restored {len(backup_data)} embeddings")
+print(f"✅ Restored {restored} embeddings")
 
 cursor.close()
 conn.close()
 
-print("🎉 Restore complete!")
\ No newline at end of file
+print("🎉 Restore complete!")
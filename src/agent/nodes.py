@@ -1,9 +1,12 @@
+import asyncio
+import sys
+import textwrap
 from typing import Dict
 from src.agent.state import AgentState
 from src.enrichment.domain_parser import parse_domain
 from src.enrichment.llm_enricher import LLMEnricher
 from src.enrichment.retrieval.supabase_client import SupabaseClient
-from src.enrichment.retrieval.filters import build_where_clause, get_tld_family, apply_numeric_filter
+from src.enrichment.retrieval.filters import build_where_clause, get_tld_family
 from src.enrichment.retrieval.scoring import score_candidates
 
 import config
@@ -68,18 +71,20 @@ Return STRICT JSON with this schema and nothing else:
 }}
 """
 
-def enrichment_node(state: AgentState) ->Dict:
+async def enrichment_node(state: AgentState) ->Dict:
     """
-    Node 1: Extract basic features and call LLM for enrichment. 
+    Node 1: Extract basic features and call LLM for enrichment.
+    Async so the OpenRouter round-trip overlaps with local domain parsing.
     """
     try:
         domain_name = state["input_domain"]
 
-        # Parse domain
-        parsed = parse_domain(domain_name)
-
-        # call LLms once for categories + description
-        enriched = llm_enricher.enrich_domain(domain_name, LLM_PROMPT_TEMPLATE)
+        # Call the LLM and parse the domain concurrently - the LLM round-trip
+        # (1-3s) dominates, so local work rides along for free
+        enriched, parsed = await asyncio.gather(
+            llm_enricher.aenrich_domain(domain_name, LLM_PROMPT_TEMPLATE),
+            asyncio.to_thread(parse_domain, domain_name),
+        )
 
         return {
             "sld": parsed["sld"],
@@ -88,7 +93,8 @@ def enrichment_node(state: AgentState) ->Dict:
             "has_numbers": parsed["has_numbers"],
             "primary_category": enriched["primary_category"],
             "secondary_category": enriched["secondary_category"],
-            "descriptions": enriched["descriptions"]
+            "descriptions": enriched["descriptions"],
+            "queries": _clean_queries(enriched["descriptions"])
         }
     except Exception as e:
         print(f"[DEBUG] enrichment_node: Exception caught: {e}")
@@ -107,65 +113,48 @@ def enrichment_node(state: AgentState) ->Dict:
             "primary_category": "Brandable",
             "secondary_category": "Service-based",
             "descriptions": mock_descriptions,
+            "queries": _clean_queries(mock_descriptions),
             "error": f"Enrichment failed (using mock data): {str(e)}"
         }
 
-    
-def build_queries_node(state: AgentState) -> Dict:
-    """
-    Node 2: Build query texts from descriptions.
-    """
-    descriptions = state.get("descriptions", [])
 
-    # Clean descriptions
-    queries = []
-    for desc in descriptions:
-        cleaned = desc.strip()
-        if cleaned:
-            queries.append(cleaned)
-    return {"queries": queries}
+def _clean_queries(descriptions) -> list:
+    """Strip and drop empty descriptions - query building is trivial, so it
+    lives inside the enrichment node instead of its own graph node"""
+    return [cleaned for desc in descriptions if (cleaned := desc.strip())]
 
 
 def retrieve_node(state: AgentState) ->Dict:
-    """ 
-    Node 3: Retrieve candidates from ChromaDB with hard filters.
+    """
+    Node 2: Retrieve candidates from ChromaDB with hard filters.
     Implements tiered fallback for unknown TLDs.
     """
     try:
         queries = state["queries"]
         tld_family = get_tld_family(state["tld"])
 
+        # Numeric filtering happens inside the store via the ingest-time
+        # numeric_pct metadata, so there's no Python post-filter pass
+        input_has_numbers = state.get("has_numbers", False) if config.ENABLE_NUMERIC_FILTER else None
+
         # Build where clause from state (with TLD filter)
         where = build_where_clause(
             tld=state["tld"],
             length=state["length"],
             primary_category=state["primary_category"],
             secondary_category=state["secondary_category"],
-            include_tld_filter=True
+            include_tld_filter=True,
+            input_has_numbers=input_has_numbers
+        )
+
+        # Query all descriptions in one batched call - the client embeds
+        # every query text together and tags query_index per candidate
+        all_candidates = supabase_client.query(
+            query_texts=queries,
+            where=where,
+            n_results=config.CHROMA_RESULTS_PER_QUERY
         )
 
-        # Query ChromaDB for each description
-        all_candidates = []
-        for query_idx, query in enumerate(queries, start=1):
-            candidates = supabase_client.query(
-                query_texts=[query],
-                where=where,
-                n_results=config.CHROMA_RESULTS_PER_QUERY
-            )
-            # Tag each candidate with which query found it
-            for candidate in candidates:
-                candidate["query_index"] = query_idx
-            
-            all_candidates.extend(candidates)
-
-        # New: Apply numeric filter BEFORE fallback Check 
-        if config.ENABLE_NUMERIC_FILTER:
-            all_candidates = apply_numeric_filter(
-               all_candidates,
-               input_has_numbers=state.get("has_numbers", False),
-               threshold = config.NUMERIC_THRESHOLD
-            )
-        
         # Check if we have enough results for unknown TLDs
         if config.ENABLE_TLD_FALLBACK and len(all_candidates) < config.MIN_RESULTS_THRESHOLD:
             print(f"\n[INFO] Only {len(all_candidates)} results for unknown TLD '{state['tld']}'")
@@ -177,30 +166,17 @@ def retrieve_node(state: AgentState) ->Dict:
                 length=state["length"],
                 primary_category=state["primary_category"],
                 secondary_category=state["secondary_category"],
-                include_tld_filter=False  # Remove TLD filter
+                include_tld_filter=False,  # Remove TLD filter
+                input_has_numbers=input_has_numbers
             )
-            
-            # Retry search without TLD filter
-            all_candidates = []
-            for query_idx, query in enumerate(queries, start=1):
-                candidates = supabase_client.query(
-                    query_texts=[query],
-                    where=where_no_tld,
-                    n_results=config.CHROMA_RESULTS_PER_QUERY
-                )
-                # Tag each candidate with which query found it
-                for candidate in candidates:
-                    candidate["query_index"] = query_idx
-                
-                all_candidates.extend(candidates)
-
-            if config.ENABLE_NUMERIC_FILTER:
-                all_candidates = apply_numeric_filter(
-                    all_candidates,
-                    input_has_numbers=state.get("has_numbers", False),
-                    threshold = config.NUMERIC_THRESHOLD
-                )
-            
+
+            # Retry search without TLD filter (same single batched call)
+            all_candidates = supabase_client.query(
+                query_texts=queries,
+                where=where_no_tld,
+                n_results=config.CHROMA_RESULTS_PER_QUERY
+            )
+
             print(f"[INFO] Expanded search found {len(all_candidates)} results across all TLDs\n")
         
         return {"raw_candidates": all_candidates}
@@ -209,7 +185,7 @@ def retrieve_node(state: AgentState) ->Dict:
         return {"error": f"Retrieval failed: {str(e)}"}
 
 def score_node(state: AgentState) -> Dict:
-    """ Node 4: Score, rerank, and deduplicate candidates."""
+    """ Node 3: Score, rerank, and deduplicate candidates."""
 
     try:
         candidates = state["raw_candidates"]
@@ -223,52 +199,53 @@ def score_node(state: AgentState) -> Dict:
         )
         
         # ===== MATCHING ANALYSIS LOGGING =====
-        print("\n" + "="*80)
-        print(f"MATCHING ANALYSIS - {state['input_domain']}")
-        print("="*80)
-        
-        # Show input descriptions first
-        print("\nINPUT DESCRIPTIONS:")
-        for i, desc in enumerate(input_descriptions, start=1):
-            print(f"\n  Query #{i}:")
-            print(f"  {desc[:150]}...")
-        
-        print("\n" + "-"*80)
-        print("TOP MATCHES:")
-        print("-"*80)
-        
-        for idx, comp in enumerate(scored, start=1):
-            query_idx = comp.get("query_index", 0)
-            desc_idx = comp.get("desc_index", 1)
-            
-            print(f"\n{idx}. {comp['domain']} - ${comp['price']:,.0f}")
-            print(f"   Score: {comp['score']:.4f} | Semantic: {comp['semantic_sim']:.4f} | Category: {comp['cat_match']:.2f} | Recency: {comp['recency']:.2f}")
-            print(f"   Categories: {comp['primary_category']} / {comp['secondary_category']}")
-            print(f"   Date: {comp['date']} | Platform: {comp['platform']}")
-            print(f"   >> Matched: Input Query #{query_idx} <-> {comp['domain']} Description #{desc_idx}")
-            
-            # Show matched description if available
-            if comp.get("description"):
-                print(f"   📝 Description (Desc #{desc_idx}):")
-                # Show full description, wrapped nicely
-                desc = comp['description']
-                # Split into lines of max 100 chars for readability
-                import textwrap
-                wrapped = textwrap.fill(desc, width=100, initial_indent='      ', subsequent_indent='      ')
-                print(wrapped)
-            else:
-                print(f"   ⚠️  Warning: No description extracted for this match")
-        
-        print("\n" + "="*80 + "\n")
+        # Buffered into one stdout write and gated behind a config flag so
+        # production runs skip the formatting entirely
+        if config.VERBOSE_MATCH_LOG:
+            buf = []
+            buf.append("\n" + "="*80)
+            buf.append(f"MATCHING ANALYSIS - {state['input_domain']}")
+            buf.append("="*80)
+
+            # Show input descriptions first
+            buf.append("\nINPUT DESCRIPTIONS:")
+            for i, desc in enumerate(input_descriptions, start=1):
+                buf.append(f"\n  Query #{i}:")
+                buf.append(f"  {desc[:150]}...")
+
+            buf.append("\n" + "-"*80)
+            buf.append("TOP MATCHES:")
+            buf.append("-"*80)
+
+            for idx, comp in enumerate(scored, start=1):
+                query_idx = comp.get("query_index", 0)
+                desc_idx = comp.get("desc_index", 1)
+
+                buf.append(f"\n{idx}. {comp['domain']} - ${comp['price']:,.0f}")
+                buf.append(f"   Score: {comp['score']:.4f} | Semantic: {comp['semantic_sim']:.4f} | Category: {comp['cat_match']:.2f} | Recency: {comp['recency']:.2f}")
+                buf.append(f"   Categories: {comp['primary_category']} / {comp['secondary_category']}")
+                buf.append(f"   Date: {comp['date']} | Platform: {comp['platform']}")
+                buf.append(f"   >> Matched: Input Query #{query_idx} <-> {comp['domain']} Description #{desc_idx}")
+
+                # Show matched description if available
+                if comp.get("description"):
+                    buf.append(f"   📝 Description (Desc #{desc_idx}):")
+                    # Show full description, wrapped to 100 chars for readability
+                    buf.append(textwrap.fill(comp['description'], width=100, initial_indent='      ', subsequent_indent='      '))
+                else:
+                    buf.append(f"   ⚠️  Warning: No description extracted for this match")
+
+            buf.append("\n" + "="*80 + "\n")
+            sys.stdout.write("\n".join(buf) + "\n")
         # ===== END LOGGING =====
-        
+
         return {"scored_comparables": scored}
 
     except Exception as e:
         return {"error": f"Scoring failed: {str(e)}"}
 
 def output_node(state: AgentState) -> Dict:
-    """Node 5: Format final output as structured JSON."""
+    """Node 4: Format final output as structured JSON."""
     # Check if there was a real error (not mock data)
     error = state.get("error")
     if error and "using mock data" not in str(error):
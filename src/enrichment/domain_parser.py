@@ -1,22 +1,34 @@
+import functools
 import tldextract
 import re
 
-def parse_domain(domain_name: str) -> dict:
-    """ 
-    Extract SLD, TLD, and compute basic features from domain.
+# One process-wide extractor with network fetches disabled - the bundled
+# public-suffix snapshot loads once instead of per call
+_EXTRACT = tldextract.TLDExtract(
+    suffix_list_urls=(),
+    include_psl_private_domains=False
+)
 
-    Args:
-       domain_name: e.g. , "harmonyfoundationinc.com"
+# Precompiled once: protocol/path strip in a single pass, CamelCase and
+# digit probes for the feature checks
+_PROTO_RE = re.compile(r'^(?:https?://)?([^/]+)')
+_CAMEL_RE = re.compile(r'[a-z][A-Z]')
+_DIGIT_RE = re.compile(r'\d')
 
-    Returns:
-       dict with sld, tld, length, is_multi_word
-    """
-    # Remove protocol if present
-    domain_name = domain_name.replace("http://", "").replace("https://", "")
-    domain_name = domain_name.split("/")[0]
+@functools.lru_cache(maxsize=100_000)
+def _extract_cached(domain_name: str):
+    """PSL parse with memoization - the same domains recur across queries"""
+    return _EXTRACT(domain_name)
+
+@functools.lru_cache(maxsize=10_000)
+def _parse_domain_cached(domain_name: str) -> tuple:
+    """Pure parsing core, memoized as an immutable tuple"""
+    # Strip protocol and path in one regex pass (vs chained replace/split)
+    m = _PROTO_RE.match(domain_name)
+    host = m.group(1) if m else domain_name
 
     # Extract parts
-    extracted = tldextract.extract(domain_name)
+    extracted = _extract_cached(host)
     sld = extracted.domain
     tld = f".{extracted.suffix}" if extracted.suffix else ".com"
 
@@ -24,14 +36,28 @@ def parse_domain(domain_name: str) -> dict:
     length = len(sld)
 
     # Check if multi-word (has hyphens or CamelCase)
-    has_hyphens = "-" in sld
-    has_camel_case = bool(re.search(r'[a-z][A-Z]', sld))
-    is_multi_word = has_hyphens or has_camel_case
+    is_multi_word = "-" in sld or bool(_CAMEL_RE.search(sld))
 
-    # NEW: Check for Numbers
-    has_numbers = bool(re.search(r'\d', sld))
+    # Check for Numbers
+    has_numbers = bool(_DIGIT_RE.search(sld))
     numeric_chars = sum(c.isdigit() for c in sld)
-    numeric_percentage = numeric_chars / length if length >0 else 0
+    numeric_percentage = numeric_chars / length if length > 0 else 0
+
+    return (sld, tld, length, is_multi_word, has_numbers, numeric_percentage)
+
+def parse_domain(domain_name: str) -> dict:
+    """
+    Extract SLD, TLD, and compute basic features from domain.
+
+    Args:
+       domain_name: e.g. , "harmonyfoundationinc.com"
+
+    Returns:
+       dict with sld, tld, length, is_multi_word
+    """
+    sld, tld, length, is_multi_word, has_numbers, numeric_percentage = (
+        _parse_domain_cached(domain_name)
+    )
 
     return {
         "sld": sld,
@@ -41,6 +67,3 @@ def parse_domain(domain_name: str) -> dict:
         "has_numbers": has_numbers,
         "numeric_percentage": numeric_percentage
     }
-
-
-    
\ No newline at end of file
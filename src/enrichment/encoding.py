@@ -0,0 +1,191 @@
+import hashlib
+import os
+from functools import lru_cache
+
+import numpy as np
+
+import config
+
+@lru_cache(maxsize=1)
+def get_encoder(device=None):
+    """Process-wide SentenceTransformer singleton.
+
+    Loading the model reads ~90MB of weights from disk; scripts that chain
+    (migrate then populate) or servers that import several clients should
+    all share one resident instance.
+    """
+    import torch
+    from sentence_transformers import SentenceTransformer
+
+    torch.set_num_threads(os.cpu_count())
+    if device is None and torch.cuda.is_available():
+        device = "cuda"
+
+    # CPU serving can opt into the ONNX export (int8 when quantized) -
+    # same .encode() surface, so callers never notice
+    if config.USE_ONNX_ENCODER and not (device and device.startswith("cuda")):
+        return OnnxMiniLM(config.ONNX_MODEL_DIR)
+
+    model = SentenceTransformer(config.EMBEDDING_MODEL, device=device)
+    model.eval()
+    if device and device.startswith("cuda"):
+        model.half()  # FP16 roughly doubles GPU throughput for MiniLM
+    return model
+
+class OnnxMiniLM:
+    """
+    Drop-in .encode() replacement that runs all-MiniLM-L6-v2 through ONNX
+    Runtime instead of PyTorch eager (~4x faster on CPU).
+
+    Expects a model directory exported with:
+        optimum-cli export onnx --model sentence-transformers/all-MiniLM-L6-v2 onnx_minilm/
+
+    For another 2-4x on x86, add a dynamically int8-quantized copy
+    (weights shrink 4x and matmuls use VNNI dot-product instructions;
+    activations and outputs stay float32, so the embedding dimension and
+    pgvector column are untouched):
+        from optimum.onnxruntime import ORTQuantizer
+        from optimum.onnxruntime.configuration import AutoQuantizationConfig
+        ORTQuantizer.from_pretrained("onnx_minilm").quantize(
+            save_dir="onnx_minilm",
+            quantization_config=AutoQuantizationConfig.avx512_vnni(is_static=False))
+    The quantized file is picked up automatically when present.
+    """
+
+    def __init__(self, model_dir="onnx_minilm", providers=None):
+        # Imported lazily so onnxruntime stays an optional dependency
+        import onnxruntime as ort
+        from transformers import AutoTokenizer
+
+        options = ort.SessionOptions()
+        options.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+        options.intra_op_num_threads = os.cpu_count()
+
+        # Prefer the int8-quantized export when it exists
+        model_path = os.path.join(model_dir, "model_quantized.onnx")
+        if not os.path.exists(model_path):
+            model_path = os.path.join(model_dir, "model.onnx")
+
+        self.session = ort.InferenceSession(
+            model_path,
+            options,
+            providers=providers or ["CPUExecutionProvider"]
+        )
+        self.tokenizer = AutoTokenizer.from_pretrained(model_dir)
+        self._input_names = {i.name for i in self.session.get_inputs()}
+
+    def encode(self, texts, batch_size=64, convert_to_numpy=True,
+               normalize_embeddings=False, show_progress_bar=False):
+        """Tokenize, run the ONNX session, mean-pool and optionally normalize"""
+        chunks = []
+        for start in range(0, len(texts), batch_size):
+            batch = texts[start:start + batch_size]
+            enc = self.tokenizer(
+                batch,
+                padding=True,
+                truncation=True,
+                max_length=256,
+                return_tensors="np"
+            )
+            inputs = {k: v for k, v in enc.items() if k in self._input_names}
+            hidden = self.session.run(None, inputs)[0]
+
+            # Mean pooling weighted by the attention mask
+            mask = enc["attention_mask"][..., None].astype(hidden.dtype)
+            pooled = (hidden * mask).sum(axis=1) / np.clip(mask.sum(axis=1), 1e-9, None)
+            chunks.append(pooled)
+
+        emb = np.concatenate(chunks) if chunks else np.empty((0, 384), dtype=np.float32)
+        if normalize_embeddings:
+            emb = emb / np.linalg.norm(emb, axis=1, keepdims=True)
+        return emb
+
+
+def smart_encode(model, docs, batch_size=64, **encode_kwargs):
+    """
+    Encode documents with length-sorted batching.
+
+    SBERT pads every mini-batch to its longest item, so feeding documents in
+    length order minimizes padding tokens. Results are scattered back to the
+    original order before returning.
+
+    Args:
+        model: A SentenceTransformer instance
+        docs: List of strings to embed
+        batch_size: Mini-batch size for the encoder
+        **encode_kwargs: Extra args forwarded to model.encode
+                         (e.g. normalize_embeddings, show_progress_bar)
+
+    Returns:
+        numpy array of embeddings in the original document order
+    """
+    # Encode each distinct string once - templated listing text repeats a lot
+    unique, inverse = np.unique(np.array(docs, dtype=object), return_inverse=True)
+    unique = list(unique)
+
+    order = sorted(range(len(unique)), key=lambda i: len(unique[i]))
+    sorted_docs = [unique[i] for i in order]
+
+    emb = model.encode(
+        sorted_docs,
+        batch_size=batch_size,
+        convert_to_numpy=True,
+        **encode_kwargs
+    )
+
+    uniq_emb = np.empty_like(emb)
+    uniq_emb[order] = emb
+
+    # Scatter unique embeddings back to the original (possibly duplicated) rows
+    return uniq_emb[inverse]
+
+
+def cached_encode(model, docs, cache_dir=".emb_cache", batch_size=64, **encode_kwargs):
+    """
+    smart_encode with a persistent on-disk cache keyed by document text.
+
+    Populate scripts get re-run repeatedly while tuning descriptions; rows
+    whose text didn't change re-embed for nothing. This keeps one .npz per
+    embedding model under cache_dir, keyed by a blake2b digest of each
+    document, so repeat runs only encode new or edited rows.
+
+    Args:
+        model: A SentenceTransformer instance
+        docs: List of strings to embed
+        cache_dir: Directory holding the per-model .npz cache
+        batch_size: Mini-batch size for the encoder
+        **encode_kwargs: Extra args forwarded to model.encode
+
+    Returns:
+        numpy array of embeddings in the original document order
+    """
+    cache_path = os.path.join(
+        cache_dir, f"{config.EMBEDDING_MODEL.replace('/', '_')}.npz"
+    )
+
+    cached = {}
+    if os.path.exists(cache_path):
+        with np.load(cache_path) as data:
+            cached = {key: data[key] for key in data.files}
+
+    keys = [
+        hashlib.blake2b(doc.encode('utf-8'), digest_size=16).hexdigest()
+        for doc in docs
+    ]
+
+    miss_idx = [i for i, key in enumerate(keys) if key not in cached]
+
+    if miss_idx:
+        miss_emb = smart_encode(
+            model,
+            [docs[i] for i in miss_idx],
+            batch_size=batch_size,
+            **encode_kwargs
+        )
+        for j, i in enumerate(miss_idx):
+            cached[keys[i]] = miss_emb[j]
+
+        os.makedirs(cache_dir, exist_ok=True)
+        np.savez_compressed(cache_path, **cached)
+
+    return np.stack([cached[key] for key in keys])
@@ -1,8 +1,27 @@
-import json
+import hashlib
+from typing import List
+import orjson
+from cachetools import LRUCache
 from langchain_openai import ChatOpenAI
 from langchain_core.messages import HumanMessage, SystemMessage
+from pydantic import BaseModel, ValidationError, model_validator
 import config
 
+class EnrichmentSchema(BaseModel):
+    """Expected shape of the LLM enrichment response"""
+    domain: str = ""
+    primary_category: str
+    secondary_category: str
+    descriptions: List[str]
+
+    @model_validator(mode="after")
+    def _check_consistency(self):
+        if self.primary_category == self.secondary_category:
+            raise ValueError("primary_category and secondary_category must differ")
+        if len(self.descriptions) < 1:
+            raise ValueError("at least one description is required")
+        return self
+
 class LLMEnricher:
     """Handles LLM-based enrichment of domain names"""
 
@@ -13,6 +32,14 @@ class LLMEnricher:
             api_key=config.OPENROUTER_API_KEY,
             base_url="https://openrouter.ai/api/v1"  # OpenRouter API endpoint
         )
+        # Repeat enrichments (retries, evaluation sweeps, batch duplicates)
+        # skip the network round-trip entirely - keyed on domain + prompt +
+        # model so a prompt or model change never serves stale results
+        self._cache = LRUCache(maxsize=4096)
+
+    def _cache_key(self, domain_name:str, prompt_template:str) -> tuple:
+        prompt_hash = hashlib.blake2b(prompt_template.encode(), digest_size=16).hexdigest()
+        return (domain_name, prompt_hash, config.LLM_MODEL)
     def enrich_domain(self, domain_name:str,prompt_template:str)-> dict:
         """
         Make a single LLM call to generate: 
@@ -28,29 +55,44 @@ class LLMEnricher:
            dict with categories and descriptions
 
         """
+        key = self._cache_key(domain_name, prompt_template)
+        cached = self._cache.get(key)
+        if cached is not None:
+            return cached
+
+        response = self.llm.invoke(self._build_messages(domain_name, prompt_template))
+        result = self._parse_response(response)
+        self._cache[key] = result
+        return result
+
+    async def aenrich_domain(self, domain_name:str, prompt_template:str)-> dict:
+        """
+        Async variant of enrich_domain - awaits the OpenRouter round-trip so
+        callers can overlap it with local work (parsing, embedding warmup).
+        """
+        key = self._cache_key(domain_name, prompt_template)
+        cached = self._cache.get(key)
+        if cached is not None:
+            return cached
+
+        response = await self.llm.ainvoke(self._build_messages(domain_name, prompt_template))
+        result = self._parse_response(response)
+        self._cache[key] = result
+        return result
+
+    def _build_messages(self, domain_name:str, prompt_template:str) -> list:
+        """Build the chat messages for an enrichment call"""
         # Replace placeholder in your prompt
         prompt = prompt_template.replace("{domain_name}", domain_name)
 
-        messages = [
+        return [
             SystemMessage(content="You are a domain analysis expert. Return valid JSON only."),
             HumanMessage(content=prompt)
         ]
 
-        response = self.llm.invoke(messages)
-
-        # Parse JSON Response
+    def _parse_response(self, response) -> dict:
+        """Parse and validate the LLM JSON response (orjson + pydantic)"""
         try:
-            result = json.loads(response.content)
-
-            # Validate structure
-            assert "primary_category" in result
-            assert "secondary_category" in result
-            assert "descriptions" in result
-            assert isinstance(result["descriptions"], list)
-            assert len(result["descriptions"]) >= 1
-            assert result["primary_category"] != result["secondary_category"]
-
-            return result
-
-        except (json.JSONDecodeError, AssertionError) as e:
+            return EnrichmentSchema.model_validate(orjson.loads(response.content)).model_dump()
+        except (orjson.JSONDecodeError, ValidationError) as e:
             raise ValueError(f"Invalid LLM response format: {e}\nResponse: {response.content}")
\ No newline at end of file
@@ -1,9 +1,29 @@
 import chromadb
 from chromadb.config import Settings
-from sentence_transformers import SentenceTransformer
 from typing import List, Dict
 import config
-import numpy as np
+from src.enrichment.encoding import get_encoder
+
+# Built once instead of a fresh list per query call
+_QUERY_INCLUDE = ["metadatas", "distances", "documents"]
+
+class _SharedEmbeddingFunction:
+    """Chroma embedding function backed by the shared process-wide encoder.
+
+    Without this, collection.query(query_texts=...) silently loads Chroma's
+    own default MiniLM alongside the SentenceTransformer we already hold.
+    """
+
+    def __init__(self, model):
+        self._model = model
+
+    def __call__(self, input):
+        return self._model.encode(
+            list(input), convert_to_numpy=True, normalize_embeddings=True
+        ).tolist()
+
+    def name(self):
+        return config.EMBEDDING_MODEL
 
 class ChromaClient:
     """ Wrapper for ChromaDB operations"""
@@ -14,14 +34,22 @@ class ChromaClient:
             settings=Settings(anonymized_telemetry=False)
         )
 
-        # Use Sentence Transformers for embeddings
-        self.embeddings = SentenceTransformer(config.EMBEDDING_MODEL)
+        # Shared process-wide Sentence Transformer singleton
+        self.embeddings = get_encoder()
 
+        # HNSW tuned for query-side recall/latency (see config.HNSW_*);
+        # a collection created with defaults needs a one-time rebuild
         self.collection = self.client.get_or_create_collection(
             name=config.CHROMA_COLLECTION_NAME,
-            metadata={"hnsw:space": "cosine"}
+            embedding_function=_SharedEmbeddingFunction(self.embeddings),
+            metadata={
+                "hnsw:space": "cosine",
+                "hnsw:M": config.HNSW_M,
+                "hnsw:construction_ef": config.HNSW_CONSTRUCTION_EF,
+                "hnsw:search_ef": config.HNSW_SEARCH_EF
+            }
         )
-    
+
     def query(self, query_texts: List[str], where: Dict, n_results: int = 50) -> List[Dict]:
         """Query ChromaDB with hard filters.
 
@@ -31,22 +59,26 @@ class ChromaClient:
             n_results: Number of results per query
 
         Returns:
-            List of candidates with metadata and distances
+            List of candidates with metadata, distances, and a 1-based
+            query_index tagging which query text found each candidate
         """
+        # Single batched ANN call for all query texts
         results = self.collection.query(
             query_texts=query_texts,
             where=where,
             n_results=n_results,
-            include=["metadatas", "distances", "documents"]
+            include=_QUERY_INCLUDE
         )
 
         candidates = []
-        for i in range(len(results["ids"][0])):
-            candidates.append({
-                "id": results["ids"][0][i],
-                "document": results["documents"][0][i],
-                "distance": results["distances"][0][i],
-                "metadata": results["metadatas"][0][i]
-            })
-
-        return candidates
\ No newline at end of file
+        for query_idx in range(len(results["ids"])):
+            for i in range(len(results["ids"][query_idx])):
+                candidates.append({
+                    "id": results["ids"][query_idx][i],
+                    "document": results["documents"][query_idx][i],
+                    "distance": results["distances"][query_idx][i],
+                    "metadata": results["metadatas"][query_idx][i],
+                    "query_index": query_idx + 1
+                })
+
+        return candidates
@@ -1,22 +1,46 @@
 from datetime import datetime
+from functools import lru_cache
 from typing import List, Dict
 import config
+import numpy as np
 import re
-import tldextract
+
+# Compiled once - digit scan used by the numeric filter hot path
+_DIGIT_RE = re.compile(r'\d')
+
+# Family TLD lists materialized once so build_where_clause doesn't re-index
+# config.TLD_FAMILIES per call
+_FAMILY_TLDS = {family: list(tlds) for family, tlds in config.TLD_FAMILIES.items()}
 
 def get_tld_family(tld: str) -> str:
-    """Return the TLD family for a given TLD"""
-    for family, tlds in config.TLD_FAMILIES.items():
-        if tld in tlds:
-            return family
-    return "other"
+    """Return the TLD family for a given TLD (O(1) reverse-map lookup)"""
+    return config.TLD_TO_FAMILY.get(tld, "other")
+
+# Only 1-2 fields change between where clauses, so the common pieces are
+# memoized instead of rebuilt per call (callers must not mutate them)
+@lru_cache(maxsize=1024)
+def _length_clauses(length: int) -> tuple:
+    return (
+        {"length": {"$gte": length - config.MAX_LENGTH_DIFF}},
+        {"length": {"$lte": length + config.MAX_LENGTH_DIFF}},
+    )
+
+@lru_cache(maxsize=256)
+def _category_clause(primary_category: str, secondary_category: str) -> Dict:
+    return {
+        "$or": [
+            {"primary_category": {"$in": [primary_category, secondary_category]}},
+            {"secondary_category": {"$in": [primary_category, secondary_category]}},
+        ]
+    }
 
 def build_where_clause(
     tld: str,
     length: int,
     primary_category: str,
     secondary_category: str,
-    include_tld_filter: bool = True
+    include_tld_filter: bool = True,
+    input_has_numbers: bool = None
 ) -> Dict:
     """Build ChromaDB where clause for hard filters.
 
@@ -24,13 +48,17 @@ def build_where_clause(
     1. TLD family match (optional)
     2. Length within ±2
     3. Category overlap (at least one category matches)
-    
+    4. Numeric content via ingest-time numeric_pct metadata (optional)
+
     Args:
         tld: Input domain TLD
         length: Input domain length
         primary_category: Input domain primary category
         secondary_category: Input domain secondary category
         include_tld_filter: Whether to include TLD filter (default: True)
+        input_has_numbers: Whether the input domain contains numbers; when
+            set, the numeric filter runs in the store instead of a Python
+            post-pass (default: None = no numeric predicate)
     """
     tld_family = get_tld_family(tld)
 
@@ -40,29 +68,26 @@ def build_where_clause(
         tld_filter = tld
     else:
         # Known family - use the entire family list
-        tld_filter = config.TLD_FAMILIES[tld_family]
-
-    # Build base filters (length + category)
-    where = {
-        "$and": [
-            {"length": {"$gte": length - config.MAX_LENGTH_DIFF}},
-            {"length": {"$lte": length + config.MAX_LENGTH_DIFF}},
-            
-            # Category filter (always applied)
-            {
-                "$or": [
-                    {"primary_category": {"$in": [primary_category, secondary_category]}},
-                    {"secondary_category": {"$in": [primary_category, secondary_category]}},
-                ]
-            }
-        ]
-    }
-    
+        tld_filter = _FAMILY_TLDS[tld_family]
+
+    # Assemble from memoized pieces: length bounds + (optional) TLD +
+    # category filter (always applied)
+    clauses = list(_length_clauses(length))
+
     # Add TLD filter only if include_tld_filter is True
     if include_tld_filter:
-        where["$and"].insert(2, {"tld": {"$in": tld_filter if isinstance(tld_filter, list) else [tld_filter]}})
-    
-    return where
+        clauses.append({"tld": {"$in": tld_filter if isinstance(tld_filter, list) else [tld_filter]}})
+
+    clauses.append(_category_clause(primary_category, secondary_category))
+
+    # Numeric filter as a store-side predicate on the ingest-time numeric_pct
+    if input_has_numbers is not None and config.ENABLE_NUMERIC_FILTER:
+        if input_has_numbers:
+            clauses.append({"numeric_pct": {"$gte": config.NUMERIC_THRESHOLD}})
+        else:
+            clauses.append({"numeric_pct": {"$lt": config.NUMERIC_THRESHOLD}})
+
+    return {"$and": clauses}
 
 def apply_length_band_filter(candidates: List[Dict], target_length: int) -> List[Dict]:
     """
@@ -98,31 +123,32 @@ def apply_numeric_filter(candidates: List[Dict], input_has_numbers: bool, thresh
     Returns:
         Filtered candidate list
     """
-    # if input_has_numbers:
-    #     # Input has numbers - don't filter out numeric domains
-    #     return candidates
-    
-    # Input has NO numbers - filter out highly numeric domains
-    filtered = []
-    for candidate in candidates:
-        domain = candidate["metadata"].get("domain", "")
-        extracted = tldextract.extract(domain)
-        sld = extracted.domain
-
-        numeric_pct = get_numeric_percentage(sld)
-
-        if input_has_numbers:
-             
-             if numeric_pct >=threshold:
-                filtered.append(candidate)
-        else:
-
-        # Only include if numeric percentage is below threshold
-            if numeric_pct < threshold:
-                
-                filtered.append(candidate)
+    if not candidates:
+        return candidates
+
+    # Vectorized single pass preferring ingest-time metadata: rows carrying
+    # numeric_pct (or sld) skip the recompute entirely; only legacy rows
+    # fall back to splitting the first label and counting digits in C via
+    # the compiled regex.
+    def _numeric_pct(metadata: Dict) -> float:
+        pct = metadata.get("numeric_pct")
+        if pct is not None:
+            return pct
+        sld = metadata.get("sld") or metadata.get("domain", "").split(".", 1)[0]
+        return len(_DIGIT_RE.findall(sld)) / len(sld) if sld else 0.0
+
+    numeric_pct = np.fromiter(
+        (_numeric_pct(candidate["metadata"]) for candidate in candidates),
+        dtype=np.float64, count=len(candidates)
+    )
+
+    # Input with numbers keeps numeric comps; without, filters them out
+    if input_has_numbers:
+        keep = numeric_pct >= threshold
+    else:
+        keep = numeric_pct < threshold
 
-    return filtered
+    return [candidate for candidate, k in zip(candidates, keep.tolist()) if k]
 
 
 
@@ -1,7 +1,15 @@
+import heapq
+import re
 from datetime import datetime
 from typing import List, Dict
+import numpy as np
+import pandas as pd
 import config
 
+# One compiled scan replaces the old chain of substring probes; handles
+# every observed spacing variant ("Description: ", ".Description:", ...)
+_DESC_RE = re.compile(r'(?:\.?\s*)Description\s*:\s*(.*)$', re.DOTALL)
+
 def compute_category_match(
     candidate_primary: str,
     candidate_secondary: str,
@@ -35,6 +43,54 @@ def compute_category_match(
 
     return 0.0
 
+# Compatible category pairs as integer-ID tuples, mirroring the sets in
+# compute_category_match, so the bulk kernel compares int arrays
+_COMPATIBLE_ID_PAIRS = [
+    (config.CATEGORY_IDS[a], config.CATEGORY_IDS[b])
+    for a, b in [
+        ("Brandable", "Generic"),
+        ("Descriptive", "Keyword"),
+        ("Service-based", "Product-based"),
+        ("Niche", "Generic"),
+    ]
+]
+
+def compute_category_match_bulk(
+    cand_primary_ids: np.ndarray,
+    cand_secondary_ids: np.ndarray,
+    input_primary_id: int,
+    input_secondary_id: int
+) -> np.ndarray:
+    """
+    Vectorized category match over integer category IDs.
+
+    Same tiers as compute_category_match (1.0 / 0.7 / 0.5 / 0.0) computed
+    with array comparisons instead of per-candidate string checks. Scores
+    are layered lowest to highest so the strongest rule wins.
+
+    Categories outside DOMAIN_CATEGORIES all share ID -1, so -1 rows never
+    earn a match here - two different unknown strings must not look equal.
+    score_candidates redoes those rows through the exact string path.
+    """
+    score = np.zeros(len(cand_primary_ids))
+
+    for a, b in _COMPATIBLE_ID_PAIRS:
+        compatible = (
+            ((cand_primary_ids == a) & (input_primary_id == b))
+            | ((cand_primary_ids == b) & (input_primary_id == a))
+        )
+        score = np.where(compatible, 0.5, score)
+
+    secondary_overlap = (
+        ((cand_secondary_ids >= 0) & (cand_secondary_ids == input_primary_id))
+        | ((cand_primary_ids >= 0) & (cand_primary_ids == input_secondary_id))
+    )
+    score = np.where(secondary_overlap, 0.7, score)
+
+    exact = (cand_primary_ids >= 0) & (cand_primary_ids == input_primary_id)
+    return np.where(exact, 1.0, score)
+
+
 def compute_tld_match(candidate_tld: str, input_tld: str) -> float:
     """
     Compute TLD match score.
@@ -61,6 +117,21 @@ def compute_tld_match(candidate_tld: str, input_tld: str) -> float:
     return 0.0
 
 
+def compute_recency_weights_bulk(days_old: np.ndarray) -> np.ndarray:
+    """
+    Vectorized recency weights for an array of candidate ages.
+
+    Args:
+        days_old: integer array of days since each sale
+
+    Returns:
+        array of weights from RECENCY_BANDS, one SIMD lookup instead of
+        a Python comparison loop per candidate
+    """
+    idx = np.searchsorted(config.RECENCY_THRESHOLDS, days_old, side='right')
+    return config.RECENCY_WEIGHTS[idx]
+
+
 def compute_recency_weight(sale_data: str) -> float:
     """
     Compute recency weight based on sale data.
@@ -83,12 +154,31 @@ def compute_recency_weight(sale_data: str) -> float:
     except Exception:
         return 0.5
 
+def _extract_description(document: str) -> str:
+    """Extract the description text from a candidate document.
+
+    Handles the various document formats seen in the data:
+        "Domain: X. Category: Y, Z. Description: ABC"
+        "Domain: X.Category: Y,Z Description:ABC" (no spaces)
+    """
+    if not document:
+        return ""
+
+    m = _DESC_RE.search(document)
+    return m.group(1).strip() if m else ""
+
+
 def score_candidates(candidates: List[Dict], input_primary: str, input_secondary: str, input_tld:str) -> List[Dict]:
     """ Score and rank all candidates using hybrid strategy.
 
     Composite score:
        0.6 * semantic_sim + 0.2 * cat_match + 0.2 * recency_weight
 
+    Scoring runs column-wise (SoA): distances, category IDs and dates are
+    gathered into arrays once and the score is one NumPy expression, so
+    per-candidate work shrinks to gathering fields. Result dicts (and the
+    description extraction) are only built for the final top-K survivors.
+
     Args:
         candidates: Raw candidates from Chroma with metadata and distances
         input_primary: Input domain primary category
@@ -98,103 +188,122 @@ def score_candidates(candidates: List[Dict], input_primary: str, input_secondary
     Returns:
         List of scored candidates sorted by score(descending)
     """
-    scored = []
+    if not candidates:
+        return []
 
+    # Deduplicate by domain BEFORE scoring: same-domain rows share category
+    # and date metadata, so distance alone decides which row would win the
+    # final dedup - keep the closest and never score the rest
+    best_by_domain = {}
     for candidate in candidates:
-        metadata = candidate["metadata"]
-        document = candidate.get("document", "")
-
-        # Extract description from document field
-        # Handle various document formats (with or without spacing issues)
-        # Formats: "Domain: X. Category: Y, Z. Description: ABC"
-        #          "Domain: X.Category: Y,Z Description:ABC" (no spaces)
-        description = ""
-        if document:
-            # Try multiple patterns to extract description
-            desc_patterns = [
-                "Description: ",
-                "Description:",
-                " Description: ",
-                " Description:",
-                ".Description:",
-                ". Description:"
-            ]
-            
-            for pattern in desc_patterns:
-                if pattern in document:
-                    desc_start = document.find(pattern)
-                    if desc_start != -1:
-                        # Extract text after the pattern
-                        description = document[desc_start + len(pattern):].strip()
-                        break
-            
-            # Fallback: if still empty, try splitting by Category
-            if not description and "Category:" in document:
-                parts = document.split("Category:")
-                if len(parts) > 1:
-                    remaining = parts[1]
-                    if "Description" in remaining:
-                        desc_part = remaining.split("Description", 1)
-                        if len(desc_part) > 1:
-                            description = desc_part[1].lstrip(": .").strip()
-
-        # Convert distance to similarity(Chroma uses L2 distance)
-        # For cosine distance: similarity = 1- distance
-        # For L2: similarity = 1 / (1+distance)
-
-        distance = candidate.get("distance", 0)
-        semantic_sim = 1 / (1+distance) if distance >= 0 else 0.5
-
-        # Category match
-        cat_match = compute_category_match(
-            metadata.get("primary_category",""),
-            metadata.get("secondary_category",""),
+        domain = candidate["metadata"].get("domain")
+        best = best_by_domain.get(domain)
+        if best is None or candidate.get("distance", 0) < best.get("distance", 0):
+            best_by_domain[domain] = candidate
+    candidates = list(best_by_domain.values())
+
+    n = len(candidates)
+    metadatas = [candidate["metadata"] for candidate in candidates]
+
+    # Convert distance to similarity(Chroma uses L2 distance)
+    # For cosine distance: similarity = 1- distance
+    # For L2: similarity = 1 / (1+distance)
+    distances = np.fromiter(
+        (candidate.get("distance", 0) for candidate in candidates),
+        dtype=np.float64, count=n
+    )
+    semantic_sim = np.where(distances >= 0, 1.0 / (1.0 + distances), 0.5)
+
+    # Category match on integer IDs; every category outside
+    # DOMAIN_CATEGORIES maps to -1 and never matches inside the kernel
+    cand_primary_ids = np.fromiter(
+        (config.CATEGORY_IDS.get(m.get("primary_category", ""), -1) for m in metadatas),
+        dtype=np.int64, count=n
+    )
+    cand_secondary_ids = np.fromiter(
+        (config.CATEGORY_IDS.get(m.get("secondary_category", ""), -1) for m in metadatas),
+        dtype=np.int64, count=n
+    )
+    input_primary_id = config.CATEGORY_IDS.get(input_primary, -1)
+    input_secondary_id = config.CATEGORY_IDS.get(input_secondary, -1)
+    cat_match = compute_category_match_bulk(
+        cand_primary_ids,
+        cand_secondary_ids,
+        input_primary_id,
+        input_secondary_id
+    )
+
+    # Rows touching an unknown category can't be judged on IDs alone
+    # (all unknowns collide on -1), so redo just those through the exact
+    # string comparison - equal unknown strings still match
+    unknown = (cand_primary_ids < 0) | (cand_secondary_ids < 0)
+    if input_primary_id < 0 or input_secondary_id < 0:
+        unknown[:] = True
+    for i in np.flatnonzero(unknown):
+        cat_match[i] = compute_category_match(
+            metadatas[i].get("primary_category", ""),
+            metadatas[i].get("secondary_category", ""),
             input_primary,
             input_secondary
         )
-        # TLD match(optional, already filtered)
-        tld_match = compute_tld_match(metadata.get("tld",""), input_tld)
-
-        # Recency weight
-        recency = compute_recency_weight(metadata.get("date", ""))
 
-        score = (
-            config.SCORE_WEIGHTS["semantic"] * semantic_sim +
-            config.SCORE_WEIGHTS["category"] * cat_match +
-            config.SCORE_WEIGHTS["recency"] * recency
+    # Recency: rows with ingest-time date_epoch_days need only an integer
+    # subtraction; legacy rows fall back to one batched pd.to_datetime parse.
+    # Unknown dates keep the same 0.5 neutral weight as the scalar path.
+    now = pd.Timestamp.now(tz="UTC")
+    now_days = now.value // 86_400_000_000_000
+
+    epoch_days = np.fromiter(
+        (m.get("date_epoch_days") or -1 for m in metadatas),
+        dtype=np.int64, count=n
+    )
+    days_old = (now_days - epoch_days).astype(np.float64)
+    days_old[epoch_days < 0] = np.nan
+
+    legacy = np.flatnonzero(epoch_days < 0)
+    if legacy.size:
+        parsed = pd.to_datetime(
+            [metadatas[i].get("date", "") for i in legacy], utc=True, errors="coerce"
         )
-
-        scored.append({
+        days_old[legacy] = np.asarray((now - parsed).days, dtype=np.float64)
+
+    valid = ~np.isnan(days_old)
+    recency = np.where(
+        valid,
+        compute_recency_weights_bulk(np.nan_to_num(days_old)),
+        0.5
+    )
+
+    score = (
+        config.SCORE_WEIGHTS["semantic"] * semantic_sim +
+        config.SCORE_WEIGHTS["category"] * cat_match +
+        config.SCORE_WEIGHTS["recency"] * recency
+    )
+
+    # Filter by threshold (domains are already unique) and take Top K with a
+    # heap - O(N log K) instead of sorting every survivor for K~10
+    keep = np.flatnonzero(score >= config.MIN_SCORE_THRESHOLD).tolist()
+    top = heapq.nlargest(config.FINAL_TOP_K, keep, key=score.__getitem__)
+
+    # Build result dicts (and extract descriptions) only for the survivors
+    final = []
+    for i in top:
+        metadata = metadatas[i]
+        final.append({
             "domain": metadata.get("domain"),
             "price": metadata.get("price"),
             "date": metadata.get("date"),
             "platform": metadata.get("platform"),
             "primary_category": metadata.get("primary_category"),
             "secondary_category": metadata.get("secondary_category"),
-            "description": description,
-            "semantic_sim": round(semantic_sim, 4),
-            "cat_match": round(cat_match, 2),
-            "recency": round(recency, 2),
-            "score": round(score, 4),
+            "description": _extract_description(candidates[i].get("document", "")),
+            "semantic_sim": round(float(semantic_sim[i]), 4),
+            "cat_match": round(float(cat_match[i]), 2),
+            "recency": round(float(recency[i]), 2),
+            "score": round(float(score[i]), 4),
             "desc_index": metadata.get("desc_index", 1),
-            "query_index": candidate.get("query_index", 0)
-
+            "query_index": candidates[i].get("query_index", 0)
         })
 
-
-    # Filter by threshold
-    scored = [c for c in scored if c["score"] >= config.MIN_SCORE_THRESHOLD]
-
-    # Deduplicate by domain, keep highest score per domain
-    domain_best = {}
-    for candidate in scored:
-        domain = candidate["domain"]
-        if domain not in domain_best or candidate["score"] > domain_best[domain]["score"]:
-            domain_best[domain] = candidate
-    
-    # Sort by score descending
-    final = sorted(domain_best.values(), key=lambda x:x["score"], reverse=True)
-
-    # Keep Top K
-    return final[:config.FINAL_TOP_K]
+    return final
 
@@ -1,30 +1,144 @@
+import collections
+import functools
+import hashlib
+import re
+import numpy as np
 import psycopg2
-from psycopg2.extras import RealDictCursor
-from sentence_transformers import SentenceTransformer
-from typing import List, Dict
+from psycopg2 import pool
+from pgvector.psycopg2 import register_vector
+from typing import List, Dict, Tuple
 import config
-import json
 import tldextract
+from src.enrichment.encoding import get_encoder
 
-class SupabaseClient:
-    """ Wrapper for Supabase/ PostgreSQL vector operations(pgvector)"""
-    def __init__(self):
-        # Initialize embedding model 
-        self.embeddings = SentenceTransformer(config.EMBEDDING_MODEL)
+# Memoized PSL parse (same domains recur across rows) and a compiled digit
+# probe instead of a per-character Python generator
+_extract = functools.lru_cache(maxsize=100_000)(
+    tldextract.TLDExtract(suffix_list_urls=()).__call__
+)
+_DIGIT_RE = re.compile(r'\d')
+
+# Two-label domains with one of these suffixes split on rfind('.') alone -
+# no PSL trie walk. Anything else (foo.co.uk, odd suffixes) falls back to
+# tldextract for the correct public-suffix parse
+_COMMON_TLDS = frozenset({
+    'com', 'net', 'org', 'io', 'ai', 'co', 'app', 'dev',
+    'xyz', 'info', 'biz', 'me', 'us', 'tech', 'online', 'store',
+})
+
+def _fast_split(domain: str):
+    """(sld, tld) for simple two-label domains, None when unsure"""
+    i = domain.rfind('.')
+    if i > 0 and domain[i + 1:] in _COMMON_TLDS and '.' not in domain[:i]:
+        return domain[:i], domain[i:]
+    return None
+
+# Array form for the vectorized batch path (np.isin wants an array)
+_COMMON_TLDS_ARR = np.array(sorted(_COMMON_TLDS))
+
+# Metadata keys that may appear in filters - anything else is rejected so
+# user input can never reach the JSON path side of the generated SQL
+_ALLOWED_FILTER_FIELDS = frozenset({
+    "domain", "tld", "length", "numeric_pct", "has_numbers", "price",
+    "date", "date_epoch_days", "platform",
+    "primary_category", "secondary_category", "desc_index",
+})
 
-        # Connect to SupaBase PostgreSQL
-        self.conn = psycopg2.connect(
+# Operator -> (sql, params) emitters; one dict lookup per condition instead
+# of a chain of elif membership probes. ::float covers int and float fields
+# alike (length vs numeric_pct)
+_FILTER_OPS = {
+    "$gte": lambda f, v: (f"(metadata->>'{f}')::float >= %s", [v]),
+    "$lte": lambda f, v: (f"(metadata->>'{f}')::float <= %s", [v]),
+    "$gt": lambda f, v: (f"(metadata->>'{f}')::float > %s", [v]),
+    "$lt": lambda f, v: (f"(metadata->>'{f}')::float < %s", [v]),
+    "$in": lambda f, v: (
+        f"metadata->>'{f}' IN ({', '.join(['%s'] * len(v))})", list(v)
+    ),
+    "$eq": lambda f, v: (f"metadata->>'{f}' = %s", [v]),
+}
+
+# One shared connection pool per process - every SupabaseClient borrows from it
+# instead of paying a fresh TCP+TLS handshake
+_pg_pool = None
+
+def _get_pool():
+    global _pg_pool
+    if _pg_pool is None:
+        _pg_pool = pool.ThreadedConnectionPool(
+            minconn=1,
+            maxconn=20,
             host=config.SUPABASE_HOST,
             port=config.SUPABASE_PORT,
             database=config.SUPABASE_DB,
             user=config.SUPABASE_USER,
-            password=config.SUPABASE_PASSWORD,
-            cursor_factory = RealDictCursor
+            password=config.SUPABASE_PASSWORD
         )
-        self.cursor = self.conn.cursor()
+    return _pg_pool
+
+class SupabaseClient:
+    """ Wrapper for Supabase/ PostgreSQL vector operations(pgvector)"""
+    def __init__(self):
+        # Shared process-wide embedding model singleton
+        self.embeddings = get_encoder()
+
+        # Connections are acquired per call from the shared pool (see
+        # _acquire), so concurrent callers never serialize on one cursor
+        self._pool = _get_pool()
+
+        # Exact-match LRU over query-text embeddings - RAG queries repeat a
+        # lot, and a hit skips the transformer forward pass entirely
+        self._emb_cache = collections.OrderedDict()
+        self._emb_cache_max = 4096
 
         print(f" Connected to SupaBase PostgreSQL")
 
+    def _acquire(self):
+        """Borrow a pooled connection, doing one-time session setup on first
+        use: pgvector type adapter (numpy arrays bind directly as vector
+        params), the HNSW probe budget, and an empty prepared-statement map.
+        The setup marker lives on the connection, so each pooled session
+        pays it once no matter which client borrows it.
+        """
+        conn = self._pool.getconn()
+        if not getattr(conn, "_dq_ready", False):
+            register_vector(conn)
+            with conn.cursor() as cursor:
+                # Session-level ANN probe budget for the HNSW index on
+                # embedding (see create_supabase_indexes.py)
+                cursor.execute("SET hnsw.ef_search = %s", (config.HNSW_SEARCH_EF,))
+            conn.commit()
+            conn._dq_prepared = {}
+            conn._dq_ready = True
+        return conn
+
+    def _embed_batch(self, texts: List[str], batch_size: int = 32) -> List:
+        """Encode texts through the LRU cache; only misses hit the model"""
+        import torch
+
+        misses = [t for t in dict.fromkeys(texts) if t not in self._emb_cache]
+        if misses:
+            # inference_mode skips autograd bookkeeping; the fp32 cast
+            # covers the FP16 CUDA path - pgvector stores float32
+            with torch.inference_mode():
+                encoded = self.embeddings.encode(
+                    misses,
+                    batch_size=batch_size,
+                    convert_to_numpy=True,
+                    show_progress_bar=False
+                )
+            encoded = encoded.astype(np.float32, copy=False)
+            for text, vec in zip(misses, encoded):
+                self._emb_cache[text] = vec
+            while len(self._emb_cache) > self._emb_cache_max:
+                self._emb_cache.popitem(last=False)
+
+        out = []
+        for text in texts:
+            self._emb_cache.move_to_end(text)
+            out.append(self._emb_cache[text])
+        return out
+
     def _enrich_metadata(self, metadata: Dict) -> Dict:
         """
         Enrich metadata with missing fields calculated from domain name.
@@ -32,73 +146,194 @@ class SupabaseClient:
         """
         if 'length' not in metadata or metadata['length'] is None:
             domain = metadata.get('domain', '')
-            extracted = tldextract.extract(domain)
-            sld = extracted.domain
-            tld = '.' + extracted.suffix if extracted.suffix else ''
-            
+
+            # Fast path: plain two-label domains skip the PSL lookup
+            split = _fast_split(domain)
+            if split is not None:
+                sld, tld = split
+            else:
+                extracted = _extract(domain)
+                sld = extracted.domain
+                tld = '.' + extracted.suffix if extracted.suffix else ''
+
             # Calculate missing fields
             metadata['length'] = len(sld)
             metadata['tld'] = tld
-            metadata['has_numbers'] = any(c.isdigit() for c in sld)
-        
+            metadata['has_numbers'] = _DIGIT_RE.search(sld) is not None
+
         return metadata
 
-    
-    def query(self, query_texts: List[str], where:Dict, n_results: int = 50) -> List[Dict]:
+    def _enrich_batch(self, metadatas: List[Dict]) -> List[Dict]:
+        """
+        Vectorized _enrich_metadata over a whole candidate list (in place).
+
+        Rows missing 'length' are gathered into one numpy string array and
+        length/tld/has_numbers come out of C-level kernels; only multi-label
+        or unusual domains (foo.co.uk) drop to the scalar PSL path.
+        """
+        todo = [i for i, m in enumerate(metadatas) if m.get('length') is None]
+        if not todo:
+            return metadatas
+
+        doms = np.array([metadatas[i].get('domain', '') for i in todo])
+        parts = np.char.rpartition(doms, '.')
+        slds = parts[:, 0]
+
+        simple = (
+            (parts[:, 1] == '.')
+            & np.isin(parts[:, 2], _COMMON_TLDS_ARR)
+            & (np.char.find(slds, '.') < 0)
+        )
+        lengths = np.char.str_len(slds)
+        digit_counts = sum(np.char.count(slds, d) for d in '0123456789')
+
+        for j, i in enumerate(todo):
+            if simple[j]:
+                metadata = metadatas[i]
+                metadata['length'] = int(lengths[j])
+                metadata['tld'] = '.' + str(parts[j, 2])
+                metadata['has_numbers'] = bool(digit_counts[j] > 0)
+            else:
+                self._enrich_metadata(metadatas[i])
+
+        return metadatas
+
+
+    def query(self, query_texts: List[str], where:Dict, n_results: int = 50, batch_size: int = 32, ef_search: int = None) -> List[Dict]:
         """ Query SupaBase with filters(mimics ChromaDB interface)
         Args:
             query_texts: List of description strings to embed and search
             where: Filter clause (will be converted to SQL WHERE)
             n_results: Number of results per query
+            batch_size: Mini-batch size for the embedding forward pass
+            ef_search: Optional per-call HNSW probe budget override
+                (defaults to the session value from config.HNSW_SEARCH_EF)
 
         Returns:
-            List of candidates with metadata and distances
+            List of candidates with metadata, distances, and a 1-based
+            query_index tagging which query text found each candidate
 
         """
+        # Collapse duplicate query texts before doing any work: each
+        # distinct text is encoded once and searched once, and results fan
+        # back out per original position below
+        unique_texts = list(dict.fromkeys(query_texts))
 
-        candidates = []
-
-        for query_text in query_texts:
-            # Generate embedding for query
-            query_embedding = self.embeddings.encode(query_text).tolist()
+        # One batched forward pass for the cache misses - repeats are served
+        # straight from the LRU
+        embeddings = self._embed_batch(unique_texts, batch_size=batch_size)
 
-            # Build SQL WHERE clause from ChromaDB-style filter
-            sql_where = self._build_sql_where(where)
+        # Build SQL WHERE clause from ChromaDB-style filter (parameterized -
+        # filter values travel as bind params, never spliced into the SQL)
+        sql_where, where_params = self._build_sql_where(where)
 
-            #Execute vector similarity search
-            sql = f"""
+        # Single round trip: unnest the query vectors and LATERAL-join each
+        # against its own index-backed top-n search, instead of one
+        # execute() per query text
+        sql = f"""
+            SELECT
+                q.qid,
+                t.id,
+                t.document,
+                t.metadata,
+                t.distance
+            FROM unnest(%s::vector[]) WITH ORDINALITY AS q(vec, qid)
+            JOIN LATERAL (
                 SELECT
                     id,
                     content as document,
                     metadata,
-                    embedding <-> %s::vector as distance
+                    embedding <-> q.vec as distance
                 FROM domain_embeddings
                 WHERE {sql_where}
-                ORDER BY embedding <-> %s::vector
-                LIMIT %s;
-            """
-            
-            # Convert embedding list to PostgreSQL array string format
-            embedding_str = '[' + ','.join(map(str, query_embedding)) + ']'
-
-            self.cursor.execute(sql, (embedding_str, embedding_str, n_results))
-            rows = self.cursor.fetchall()
-
-            # Convert to ChromaDB-compatible format
-            for row in rows:
-                candidates.append({
-                    "id": str(row["id"]),
-                    "document": row["document"],
-                    "distance": float(row["distance"]),
-                    "metadata": row["metadata"]
-                })
+                ORDER BY embedding <-> q.vec
+                LIMIT %s
+            ) t ON true
+            ORDER BY q.qid, t.distance;
+        """
+
+        # The registered pgvector adapter binds the arrays directly -
+        # no per-float str() formatting, ~4x less wire traffic. EXECUTE a
+        # server-side prepared statement so only the first call with each
+        # where-clause shape pays parse+plan
+        params = tuple([list(embeddings)] + where_params + [n_results])
+
+        conn = self._acquire()
+        try:
+            with conn.cursor() as cursor:
+                # Prepare (and commit) first: SET LOCAL must come after,
+                # or the prepare-commit would wipe the per-call override
+                stmt_name = self._prepare_statement(cursor, conn._dq_prepared, sql)
+                if ef_search is not None:
+                    cursor.execute("SET LOCAL hnsw.ef_search = %s", (ef_search,))
+                placeholders = ", ".join(["%s"] * len(params))
+                cursor.execute(f"EXECUTE {stmt_name}({placeholders})", params)
+                rows = cursor.fetchall()
+            conn.commit()
+        finally:
+            self._pool.putconn(conn)
+
+        # Convert to ChromaDB-compatible format. Rows arrive as plain
+        # tuples (default cursor) - no RealDictCursor dict per fetched row,
+        # only the final candidate dicts get allocated
+        candidates = []
+        for qid, id_, document, metadata, distance in rows:
+            candidates.append({
+                "id": str(id_),
+                "document": document,
+                "distance": float(distance),
+                "metadata": metadata,
+                "query_index": int(qid)
+            })
+
+        # Fan results back out to the original (possibly duplicated) text
+        # positions so query_index still refers to the caller's list
+        if len(unique_texts) != len(query_texts):
+            by_text = collections.defaultdict(list)
+            for candidate in candidates:
+                by_text[unique_texts[candidate["query_index"] - 1]].append(candidate)
+            candidates = [
+                {**candidate, "query_index": i}
+                for i, text in enumerate(query_texts, start=1)
+                for candidate in by_text[text]
+            ]
 
         return candidates
     
 
-    def _build_sql_where(self, where: Dict) -> str:
+    def _prepare_statement(self, cursor, prepared: Dict[str, str], sql: str) -> str:
+        """PREPARE the given %s-parameterized SQL once per session and
+        return the statement name; later calls on the same connection
+        reuse it via the per-connection `prepared` map from _acquire.
+
+        The statement text only varies with the where-clause shape (field
+        set and $in arity), so a handful of prepared plans cover the whole
+        workload and each EXECUTE skips parse+plan on the server.
+        """
+        key = hashlib.blake2b(sql.encode(), digest_size=8).hexdigest()
+        stmt_name = prepared.get(key)
+        if stmt_name is None:
+            # Rewrite psycopg2's %s placeholders as the $1..$n positions
+            # PREPARE requires; parameter types are inferred from context
+            parts = sql.split("%s")
+            numbered = "".join(
+                part + (f"${i + 1}" if i < len(parts) - 1 else "")
+                for i, part in enumerate(parts)
+            )
+            stmt_name = f"dq_{key}"
+            cursor.execute(f"PREPARE {stmt_name} AS {numbered}")
+            # Commit before recording the name: if the PREPARE stayed in
+            # the same transaction as the first EXECUTE, an EXECUTE error
+            # would roll it back while the name survived in the map,
+            # poisoning this pooled session for every later call
+            cursor.connection.commit()
+            prepared[key] = stmt_name
+        return stmt_name
+
+
+    def _build_sql_where(self, where: Dict) -> Tuple[str, List]:
         """
-        Convert ChromaDB where clause to SQL WHERE clause.
+        Convert ChromaDB where clause to a parameterized SQL WHERE fragment.
 
         Example ChromaDB filter:
         {
@@ -112,66 +347,71 @@ class SupabaseClient:
                 ]}
             ]
         }
-        
-        Converts to SQL:
-        (metadata ->> 'length')::int >= 5 AND (metadata ->> 'length') :: int <= 9
-        AND metadata->> 'tld' IN ('.com', '.net', '.org')
-        AND (metadata->> 'primary_category' IN ('Brandable', 'Descriptive') 
-            OR metadata->> 'secondary_category' IN ('Brandable', 'Descriptive'))
-        
+
+        Converts to:
+        ("(metadata->>'length')::float >= %s AND ... AND metadata->>'tld'
+          IN (%s, %s, %s) AND (...)",
+         [5, 9, '.com', '.net', '.org', ...])
+
+        Values travel as bind parameters, which both closes the injection
+        hole and keeps the statement shape stable for plan caching. Field
+        names are checked against an allowlist.
         """
+        if not where:
+            return "TRUE", []
         if "$and" in where:
             conditions = []
+            params = []
             for condition in where["$and"]:
-                conditions.append(self._parse_condition(condition))
-            return " AND ".join(conditions)
+                sql, condition_params = self._parse_condition(condition)
+                conditions.append(sql)
+                params.extend(condition_params)
+            return " AND ".join(conditions), params
         else:
             return self._parse_condition(where)
 
-    
-    def _parse_condition(self, condition: Dict) -> str:
-        """ Parse a single condition or $or clause"""
+
+    def _parse_condition(self, condition: Dict) -> Tuple[str, List]:
+        """ Parse a single condition or $or clause into (sql, params)"""
         if "$or" in condition:
             or_conditions = []
-            for sub_condition in condition ["$or"]:
-                or_conditions.append(self._parse_condition(sub_condition))
-            return f"({ ' OR '.join(or_conditions)})"
+            params = []
+            for sub_condition in condition["$or"]:
+                sql, sub_params = self._parse_condition(sub_condition)
+                or_conditions.append(sql)
+                params.extend(sub_params)
+            return f"({ ' OR '.join(or_conditions)})", params
 
-        # Single Field Condition
+        # Single Field Condition - dispatch through _FILTER_OPS
         for field, operator_dict in condition.items():
             if field.startswith("$"):
                 continue
 
-            # Handle field condition
-            if "$gte" in operator_dict:
-                value = operator_dict["$gte"]
-                return f"(metadata->>'{field}')::int >= {value}"
-
-            elif "$lte" in operator_dict:
-                value = operator_dict["$lte"]
-                return f"(metadata->>'{field}')::int <= {value}"
-
-            elif "$in" in operator_dict:
-                values = operator_dict["$in"]
-                # Quote string values
-                quoted_values = ", ".join([f"'{v}'" for v in values])
-                return f"metadata->>'{field}' IN ({quoted_values})"
+            if field not in _ALLOWED_FILTER_FIELDS:
+                raise ValueError(f"Unsupported filter field: {field}")
 
-            elif "$eq" in operator_dict:
-                value = operator_dict["$eq"]
-                return f"metadata->>'{field}' = '{value}'"
+            for operator, value in operator_dict.items():
+                handler = _FILTER_OPS.get(operator)
+                if handler is not None:
+                    return handler(field, value)
 
-        return "TRUE"
+        return "TRUE", []
     
 
     def count(self) -> int:
         """ Return total number of documents in collection """
-        self.cursor.execute("SELECT COUNT(*) as count FROM domain_embeddings")
-        result = self.cursor.fetchone()
-        return result["count"] if result else 0
+        conn = self._acquire()
+        try:
+            with conn.cursor() as cursor:
+                cursor.execute("SELECT COUNT(*) FROM domain_embeddings")
+                result = cursor.fetchone()
+            return result[0] if result else 0
+        finally:
+            self._pool.putconn(conn)
 
     def close(self):
-        """ Close  database connection """
-        self.cursor.close()
-        self.conn.close()
-        print(" Supabase connection closed")
+        """ Close the shared connection pool (process shutdown) """
+        global _pg_pool
+        self._pool.closeall()
+        _pg_pool = None
+        print(" Supabase connection pool closed")
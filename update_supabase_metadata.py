@@ -1,66 +1,62 @@
 """
 Update existing Supabase embeddings to add missing metadata fields
-(length, tld, has_numbers) WITHOUT deleting embeddings
+(length, tld, has_numbers, numeric_pct, date_epoch_days) WITHOUT
+deleting embeddings.
+
+The whole enrichment is one set-based UPDATE executed inside PostgreSQL -
+no rows ever travel to Python. The SLD is the first label and the TLD is
+everything from the first dot, which matches the public-suffix parse for
+the bare sale domains stored here (foo.com, foo.co.uk).
 """
 import psycopg2
-from psycopg2.extras import RealDictCursor, Json
-import tldextract
 import os
 from dotenv import load_dotenv
 
 load_dotenv()
 
+# sld = first label of the stored domain
+SLD = "split_part(metadata->>'domain', '.', 1)"
+
+ENRICH_SQL = f"""
+    UPDATE domain_embeddings
+    SET metadata = metadata || jsonb_build_object(
+        'length', length({SLD}),
+        'tld', CASE WHEN strpos(metadata->>'domain', '.') > 0
+                    THEN substr(metadata->>'domain', strpos(metadata->>'domain', '.'))
+                    ELSE '' END,
+        'has_numbers', {SLD} ~ '[0-9]',
+        'numeric_pct', COALESCE(
+            (length({SLD}) - length(regexp_replace({SLD}, '[0-9]', '', 'g')))::float
+            / NULLIF(length({SLD}), 0),
+            0.0
+        ),
+        'date_epoch_days', CASE
+            WHEN metadata->>'date' ~ '^\\d{{4}}-\\d{{2}}-\\d{{2}}'
+            THEN (substring(metadata->>'date' from '^\\d{{4}}-\\d{{2}}-\\d{{2}}'))::date
+                 - DATE '1970-01-01'
+            ELSE -1 END
+    )
+    WHERE metadata->>'length' IS NULL
+       OR NOT (metadata ? 'numeric_pct' AND metadata ? 'date_epoch_days');
+"""
+
 print("🔹 Connecting to Supabase...")
 conn = psycopg2.connect(
     host=os.getenv("SUPABASE_HOST"),
     port=os.getenv("SUPABASE_PORT", "5432"),
     dbname=os.getenv("SUPABASE_DB", "postgres"),
     user=os.getenv("SUPABASE_USER", "postgres"),
-    password=os.getenv("SUPABASE_PASSWORD"),
-    cursor_factory=RealDictCursor
+    password=os.getenv("SUPABASE_PASSWORD")
 )
 cursor = conn.cursor()
 
-print("🔹 Fetching all embeddings...")
-cursor.execute("SELECT id, metadata FROM domain_embeddings")
-rows = cursor.fetchall()
-
-print(f"✅ Found {len(rows)} embeddings to update")
-
-updated = 0
-for row in rows:
-    metadata = row['metadata']
-    
-    # Check if fields are missing
-    if 'length' not in metadata or metadata['length'] is None:
-        domain = metadata.get('domain', '')
-        
-        # Calculate missing fields
-        extracted = tldextract.extract(domain)
-        sld = extracted.domain
-        tld = '.' + extracted.suffix if extracted.suffix else ''
-        
-        # Add missing fields to metadata
-        metadata['length'] = len(sld)
-        metadata['tld'] = tld
-        metadata['has_numbers'] = any(c.isdigit() for c in sld)
-        
-        # Update the row
-        cursor.execute(
-            "UPDATE domain_embeddings SET metadata = %s WHERE id = %s",
-            (Json(metadata), row['id'])
-        )
-        
-        updated += 1
-        
-        if updated % 100 == 0:
-            conn.commit()
-            print(f"   Updated {updated} rows...")
-
+print("🔹 Enriching metadata in a single set-based UPDATE...")
+cursor.execute(ENRICH_SQL)
 conn.commit()
-print(f"✅ Updated {updated} embeddings with calculated metadata")
+
+print(f"✅ Updated {cursor.rowcount} embeddings with calculated metadata")
 
 cursor.close()
 conn.close()
 
-print("🎉 Update complete! Embeddings preserved, metadata enriched.")
\ No newline at end of file
+print("🎉 Update complete! Embeddings preserved, metadata enriched.")